@@ -1,5 +1,5 @@
 from functools import lru_cache
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
 
@@ -20,6 +20,9 @@ class Settings(BaseSettings):
     TWILIO_ACCOUNT_SID: str | None = Field(default=None)
     TWILIO_AUTH_TOKEN: str | None = Field(default=None)
     TWILIO_PHONE_NUMBER: str | None = Field(default=None)
+    TWILIO_MESSAGING_SERVICE_SID: str | None = Field(default=None)
+    TWILIO_NOTIFY_SERVICE_SID: str | None = Field(default=None)
+    SMS_FAST_PATH: bool = Field(default=True)
 
     # Database Settings (for future use)
     DATABASE_URL: str = Field(default="sqlite:///./harambee_dao.db")
@@ -32,13 +35,10 @@ class Settings(BaseSettings):
     RATE_LIMIT_PER_MINUTE: int = Field(default=60)
     OTP_RATE_LIMIT_PER_HOUR: int = Field(default=5)
 
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    model_config = SettingsConfigDict(env_file=".env", case_sensitive=False)
 
 
 @lru_cache
-
 def get_settings() -> Settings:
     return Settings()
 
@@ -1,15 +1,39 @@
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
 from app.core.config import settings
 
+# The one running listener; replaced (and the old one stopped) if setup runs again
+_LISTENER: Optional[QueueListener] = None
+
+
+def _stop_listener():
+    global _LISTENER
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        _LISTENER = None
+
 
 def setup_logging():
+    global _LISTENER
     root = logging.getLogger()
     if root.handlers:
         return
     handler = logging.StreamHandler(sys.stdout)
     fmt = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
     handler.setFormatter(logging.Formatter(fmt))
-    root.addHandler(handler)
+    # Write from a background thread so request paths only enqueue records
+    _stop_listener()
+    log_queue = queue.SimpleQueue()
+    _LISTENER = QueueListener(log_queue, handler, respect_handler_level=True)
+    _LISTENER.start()
+    root.addHandler(QueueHandler(log_queue))
     level = getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
     root.setLevel(level)
+
+
+atexit.register(_stop_listener)
@@ -1,16 +1,29 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.routes import router as api_router
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.services.sms_service import shutdown_sms_executor
+from app.utils.sms import close_async_client
 
 setup_logging()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_async_client()
+    shutdown_sms_executor()
+
+
 app = FastAPI(
     title="Harambee DAO Backend",
     version="0.1.0",
-    description="API for AI-audited, multi-sig community treasury."
+    description="API for AI-audited, multi-sig community treasury.",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+
+
+class PaginationParams(BaseModel):
+    limit: int = Field(default=50, ge=1, le=1000)
+    offset: int = Field(default=0, ge=0)
@@ -1,10 +1,16 @@
 from enum import Enum
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, List
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 import re
 
 
+_NAME_RE = re.compile(r'^[a-zA-Z\s\-\'\.]+$')
+
+# Output models built in bulk by list endpoints from trusted service records
+_OUT_MODEL_CONFIG = ConfigDict(extra='ignore', frozen=True, validate_assignment=False)
+
+
 class AuditDecision(str, Enum):
     PASS = "PASS"
     FAIL = "FAIL"
@@ -63,15 +69,17 @@ class VerificationStatus(str, Enum):
 
 class GroupIn(BaseModel):
     group_name: str = Field(min_length=3, max_length=100)
-    description: Optional[str] = Field(max_length=500)
+    description: Optional[str] = Field(default=None, max_length=500)
     location: str = Field(min_length=2, max_length=100)
-    leader_phone: str = Field(regex=r'^\+[1-9]\d{8,14}$')
+    leader_phone: str = Field(pattern=r'^\+[1-9]\d{8,14}$')
     leader_name: str = Field(min_length=2, max_length=100)
     expected_member_count: int = Field(ge=5, le=1000)
     treasury_threshold: int = Field(ge=2, le=10)  # Multi-sig threshold
 
 
 class GroupOut(BaseModel):
+    model_config = _OUT_MODEL_CONFIG
+
     group_id: str
     group_name: str
     description: Optional[str]
@@ -85,20 +93,23 @@ class GroupOut(BaseModel):
 
 
 class MemberIn(BaseModel):
-    phone_number: str = Field(regex=r'^\+[1-9]\d{8,14}$')
+    phone_number: str = Field(pattern=r'^\+[1-9]\d{8,14}$')
     full_name: str = Field(min_length=2, max_length=100)
     group_id: str
-    location: Optional[str] = Field(max_length=100)
+    location: Optional[str] = Field(default=None, max_length=100)
     role: MemberRole = MemberRole.MEMBER
 
-    @validator('full_name')
+    @field_validator('full_name')
+    @classmethod
     def validate_name(cls, v):
-        if not re.match(r'^[a-zA-Z\s\-\'\.]+$', v):
+        if not _NAME_RE.match(v):
             raise ValueError('Name can only contain letters, spaces, hyphens, apostrophes, and periods')
         return v.strip()
 
 
 class MemberOut(BaseModel):
+    model_config = _OUT_MODEL_CONFIG
+
     member_id: str
     phone_number: str
     full_name: str
@@ -112,9 +123,9 @@ class MemberOut(BaseModel):
 
 
 class OTPVerificationIn(BaseModel):
-    phone_number: str = Field(regex=r'^\+[1-9]\d{8,14}$')
+    phone_number: str = Field(pattern=r'^\+[1-9]\d{8,14}$')
     otp_code: str = Field(min_length=4, max_length=8)
-    verification_type: str = Field(regex=r'^(registration|voting|password_reset)$')
+    verification_type: str = Field(pattern=r'^(registration|voting|password_reset)$')
 
 
 class OTPVerificationOut(BaseModel):
@@ -125,8 +136,8 @@ class OTPVerificationOut(BaseModel):
 
 
 class OTPRequestIn(BaseModel):
-    phone_number: str = Field(regex=r'^\+[1-9]\d{8,14}$')
-    verification_type: str = Field(regex=r'^(registration|voting|password_reset)$')
+    phone_number: str = Field(pattern=r'^\+[1-9]\d{8,14}$')
+    verification_type: str = Field(pattern=r'^(registration|voting|password_reset)$')
 
 
 class OTPRequestOut(BaseModel):
@@ -144,8 +155,7 @@ class TwilioWebhookIn(BaseModel):
     MessageSid: str = Field(alias="MessageSid")
     AccountSid: Optional[str] = Field(alias="AccountSid", default=None)
 
-    class Config:
-        allow_population_by_field_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class SMSVoteIn(BaseModel):
@@ -177,12 +187,14 @@ class KYCDocumentIn(BaseModel):
     member_id: str
     document_type: KYCDocumentType
     document_number: str = Field(min_length=3, max_length=50)
-    document_image_cid: Optional[str]  # IPFS CID
-    issuing_authority: Optional[str] = Field(max_length=100)
-    expiry_date: Optional[datetime]
+    document_image_cid: Optional[str] = None  # IPFS CID
+    issuing_authority: Optional[str] = Field(default=None, max_length=100)
+    expiry_date: Optional[datetime] = None
 
 
 class KYCDocumentOut(BaseModel):
+    model_config = _OUT_MODEL_CONFIG
+
     document_id: str
     member_id: str
     document_type: KYCDocumentType
@@ -198,11 +210,13 @@ class KYCDocumentOut(BaseModel):
 class KYCReviewIn(BaseModel):
     member_id: str
     status: KYCStatus
-    reviewer_notes: Optional[str] = Field(max_length=500)
-    required_documents: Optional[List[KYCDocumentType]]
+    reviewer_notes: Optional[str] = Field(default=None, max_length=500)
+    required_documents: Optional[List[KYCDocumentType]] = None
 
 
 class KYCReviewOut(BaseModel):
+    model_config = _OUT_MODEL_CONFIG
+
     member_id: str
     previous_status: KYCStatus
     new_status: KYCStatus
@@ -221,8 +235,16 @@ class ProposalIn(BaseModel):
     deadline: datetime
     created_by: str  # member_id
 
+    @field_validator('deadline')
+    @classmethod
+    def validate_deadline(cls, v):
+        # Server timestamps are UTC-aware; treat naive deadlines as UTC so they compare
+        return v if v.tzinfo else v.replace(tzinfo=timezone.utc)
+
 
 class ProposalOut(BaseModel):
+    model_config = _OUT_MODEL_CONFIG
+
     proposal_id: str
     group_id: str
     title: str
@@ -239,9 +261,9 @@ class ProposalOut(BaseModel):
 
 # Member Management Schemas
 class MemberUpdateIn(BaseModel):
-    full_name: Optional[str] = Field(min_length=2, max_length=100)
-    location: Optional[str] = Field(max_length=100)
-    role: Optional[MemberRole]
+    full_name: Optional[str] = Field(default=None, min_length=2, max_length=100)
+    location: Optional[str] = Field(default=None, max_length=100)
+    role: Optional[MemberRole] = None
 
 
 class MemberListOut(BaseModel):
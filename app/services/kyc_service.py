@@ -1,25 +1,86 @@
+import itertools
 import logging
 import uuid
-from datetime import datetime
-from typing import Dict, List, Optional
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from collections import defaultdict
 
 from app.models.schemas import (
     KYCDocumentIn, KYCDocumentOut, KYCReviewIn, KYCReviewOut,
     KYCStatus, KYCDocumentType, VerificationStatus
 )
-from app.services.user_service import get_member_by_id, update_member_verification_status
+from app.services.user_service import (
+    get_member_by_id, get_members_by_ids, update_member_verification_status
+)
 from app.utils.ipfs import pin_cid
 
 logger = logging.getLogger(__name__)
 
+# Government-issued ID document types accepted for auto-verification
+_GOV_ID_TYPES = frozenset({
+    KYCDocumentType.NATIONAL_ID, KYCDocumentType.PASSPORT,
+    KYCDocumentType.DRIVERS_LICENSE, KYCDocumentType.VOTER_ID
+})
+
+# Document IDs: a random per-process high half plus a counter, so IDs keep the
+# UUID shape, sort by submission order, and need no entropy read per submit
+_DOCUMENT_ID_BASE = uuid.uuid4().int >> 64 << 64
+_DOCUMENT_ID_SEQ = itertools.count(1)
+
 # In-memory storage for demo/development (replace with database in production)
 _KYC_DOCUMENTS: Dict[str, dict] = {}
-_MEMBER_DOCUMENTS: Dict[str, List[str]] = {}  # member_id -> [document_ids]
-_KYC_REVIEWS: Dict[str, List[dict]] = {}  # member_id -> [review_records]
+_MEMBER_DOCUMENTS: Dict[str, List[str]] = defaultdict(list)  # member_id -> [document_ids]
+_KYC_REVIEWS: Dict[str, List[dict]] = defaultdict(list)  # member_id -> [review_records]
+_PENDING_MEMBERS: Set[str] = set()  # members with documents awaiting KYC review
+_MEMBER_FIRST_DOC_AT: Dict[str, datetime] = {}  # member_id -> earliest document submission
+_KYC_COUNTS: Dict[KYCStatus, int] = {kyc_status: 0 for kyc_status in KYCStatus}  # members with documents, by status
+_DOCUMENT_OUT: Dict[str, KYCDocumentOut] = {}  # document_id -> built response model, rebuilt on mutation
+
+
+# Storage access is kept behind these helpers so the dicts above can be
+# swapped for a shared store (e.g. Redis hashes/lists) without touching the
+# service functions.
+def _save_document(document_record: dict) -> None:
+    """Store a document record and index it under its member."""
+    document_id = document_record["document_id"]
+    member_id = document_record["member_id"]
+    _KYC_DOCUMENTS[document_id] = document_record
+    _MEMBER_DOCUMENTS[member_id].append(document_id)
+
+
+def _store_document_out(document_record: dict) -> KYCDocumentOut:
+    """Build and cache the response model for a document record."""
+    _DOCUMENT_OUT[document_record["document_id"]] = document = KYCDocumentOut(**document_record)
+    return document
+
+
+def _document_out(document_record: dict) -> KYCDocumentOut:
+    """Return the cached response model for a document record, building it once."""
+    document = _DOCUMENT_OUT.get(document_record["document_id"])
+    if document is None:
+        document = _store_document_out(document_record)
+    return document
+
+
+def _load_member_documents(member_id: str) -> List[dict]:
+    """Get the raw document records for a member."""
+    document_ids = _MEMBER_DOCUMENTS.get(member_id, [])
+    # Fetch all records in one pass (a single MGET/pipeline on a remote store)
+    return [record for record in map(_KYC_DOCUMENTS.get, document_ids) if record is not None]
+
+
+def _save_review(review_record: dict) -> None:
+    """Append a review record to its member's review history."""
+    _KYC_REVIEWS[review_record["member_id"]].append(review_record)
+
+
+def _load_member_reviews(member_id: str) -> List[dict]:
+    """Get the raw review records for a member."""
+    return _KYC_REVIEWS.get(member_id, [])
 
 
 def submit_kyc_document(document_data: KYCDocumentIn) -> KYCDocumentOut:
-    """Submit a KYC document for verification."""
+    """Submit a KYC document for verification (callers schedule pin_document_image)."""
     logger.info("Submitting KYC document for member %s", document_data.member_id)
     
     # Validate member exists
@@ -28,15 +89,8 @@ def submit_kyc_document(document_data: KYCDocumentIn) -> KYCDocumentOut:
         raise ValueError(f"Member {document_data.member_id} does not exist")
     
     # Generate document ID
-    document_id = str(uuid.uuid4())
-    
-    # Pin document image to IPFS if provided
-    if document_data.document_image_cid:
-        try:
-            pin_cid(document_data.document_image_cid)
-            logger.info("Pinned document image CID: %s", document_data.document_image_cid)
-        except Exception as e:
-            logger.warning("Failed to pin document image: %s", e)
+    document_id = str(uuid.UUID(int=_DOCUMENT_ID_BASE | next(_DOCUMENT_ID_SEQ)))
+    now = datetime.now(timezone.utc)
     
     # Create document record
     document_record = {
@@ -48,39 +102,46 @@ def submit_kyc_document(document_data: KYCDocumentIn) -> KYCDocumentOut:
         "issuing_authority": document_data.issuing_authority,
         "expiry_date": document_data.expiry_date,
         "verification_status": VerificationStatus.PENDING,
-        "created_at": datetime.utcnow(),
+        "created_at": now,
         "verified_at": None
     }
     
-    # Store document
-    _KYC_DOCUMENTS[document_id] = document_record
+    # Store document and add to member's documents
+    _save_document(document_record)
     
-    # Add to member's documents
-    if document_data.member_id not in _MEMBER_DOCUMENTS:
-        _MEMBER_DOCUMENTS[document_data.member_id] = []
-    _MEMBER_DOCUMENTS[document_data.member_id].append(document_id)
+    # Queue member for review
+    if document_data.member_id not in _MEMBER_FIRST_DOC_AT:
+        _MEMBER_FIRST_DOC_AT[document_data.member_id] = document_record["created_at"]
+        _KYC_COUNTS[member.kyc_status] += 1
+    if member.kyc_status == KYCStatus.PENDING:
+        _PENDING_MEMBERS.add(document_data.member_id)
     
     # Auto-approve community attestations for now (in production, require manual review)
     if document_data.document_type == KYCDocumentType.COMMUNITY_ATTESTATION:
         document_record["verification_status"] = VerificationStatus.VERIFIED
-        document_record["verified_at"] = datetime.utcnow()
+        document_record["verified_at"] = now
         logger.info("Auto-approved community attestation for member %s", document_data.member_id)
     
     logger.info("Submitted KYC document %s for member %s", document_id, document_data.member_id)
     
-    return KYCDocumentOut(**document_record)
+    return _store_document_out(document_record)
 
 
-def get_member_documents(member_id: str) -> List[KYCDocumentOut]:
-    """Get all KYC documents for a member."""
-    document_ids = _MEMBER_DOCUMENTS.get(member_id, [])
-    documents = []
-    
-    for document_id in document_ids:
-        if document_id in _KYC_DOCUMENTS:
-            documents.append(KYCDocumentOut(**_KYC_DOCUMENTS[document_id]))
-    
-    return documents
+def pin_document_image(document_image_cid: str) -> None:
+    """Pin a KYC document image to IPFS (run as a background task)."""
+    try:
+        pin_cid(document_image_cid)
+        logger.info("Pinned document image CID: %s", document_image_cid)
+    except Exception as e:
+        logger.warning("Failed to pin document image: %s", e)
+
+
+def get_member_documents(member_id: str, offset: int = 0, limit: Optional[int] = None) -> List[KYCDocumentOut]:
+    """Get KYC documents for a member, optionally paginated."""
+    records = _load_member_documents(member_id)
+    if offset or limit is not None:
+        records = records[offset:None if limit is None else offset + limit]
+    return [_document_out(record) for record in records]
 
 
 def review_kyc_documents(review_data: KYCReviewIn) -> KYCReviewOut:
@@ -100,27 +161,37 @@ def review_kyc_documents(review_data: KYCReviewIn) -> KYCReviewOut:
         "previous_status": previous_status,
         "new_status": review_data.status,
         "reviewer_notes": review_data.reviewer_notes,
-        "reviewed_at": datetime.utcnow(),
+        "reviewed_at": datetime.now(timezone.utc),
         "required_documents": review_data.required_documents
     }
     
     # Store review
-    if review_data.member_id not in _KYC_REVIEWS:
-        _KYC_REVIEWS[review_data.member_id] = []
-    _KYC_REVIEWS[review_data.member_id].append(review_record)
+    _save_review(review_record)
     
     # Update member KYC status
     update_member_verification_status(review_data.member_id, kyc_status=review_data.status)
     
+    # Keep the pending-review queue and status counters in sync
+    has_documents = review_data.member_id in _MEMBER_FIRST_DOC_AT
+    if has_documents:
+        _KYC_COUNTS[previous_status] -= 1
+        _KYC_COUNTS[review_data.status] += 1
+    if review_data.status == KYCStatus.PENDING and has_documents:
+        _PENDING_MEMBERS.add(review_data.member_id)
+    else:
+        _PENDING_MEMBERS.discard(review_data.member_id)
+    
     logger.info("Updated KYC status for member %s: %s -> %s", 
                 review_data.member_id, previous_status, review_data.status)
     
     return KYCReviewOut(**review_record)
 
 
-def get_kyc_review_history(member_id: str) -> List[KYCReviewOut]:
-    """Get KYC review history for a member."""
-    reviews = _KYC_REVIEWS.get(member_id, [])
+def get_kyc_review_history(member_id: str, offset: int = 0, limit: Optional[int] = None) -> List[KYCReviewOut]:
+    """Get KYC review history for a member, optionally paginated."""
+    reviews = _load_member_reviews(member_id)
+    if offset or limit is not None:
+        reviews = reviews[offset:None if limit is None else offset + limit]
     return [KYCReviewOut(**review) for review in reviews]
 
 
@@ -137,20 +208,13 @@ def auto_verify_basic_kyc(member_id: str) -> bool:
         logger.info("Member %s phone not verified, cannot auto-verify KYC", member_id)
         return False
     
-    # Get member documents
-    documents = get_member_documents(member_id)
-    
-    # Check for valid documents
-    has_valid_id = False
-    has_community_attestation = False
-    
-    for doc in documents:
-        if doc.verification_status == VerificationStatus.VERIFIED:
-            if doc.document_type in [KYCDocumentType.NATIONAL_ID, KYCDocumentType.PASSPORT, 
-                                   KYCDocumentType.DRIVERS_LICENSE, KYCDocumentType.VOTER_ID]:
-                has_valid_id = True
-            elif doc.document_type == KYCDocumentType.COMMUNITY_ATTESTATION:
-                has_community_attestation = True
+    # Check for valid documents (raw records, no model construction needed)
+    verified_types = {
+        record["document_type"] for record in _load_member_documents(member_id)
+        if record["verification_status"] == VerificationStatus.VERIFIED
+    }
+    has_valid_id = not _GOV_ID_TYPES.isdisjoint(verified_types)
+    has_community_attestation = KYCDocumentType.COMMUNITY_ATTESTATION in verified_types
     
     # Auto-approve if has community attestation (for pilot phase)
     if has_community_attestation:
@@ -182,19 +246,19 @@ def get_pending_kyc_reviews() -> List[dict]:
     """Get all members with pending KYC reviews."""
     pending_reviews = []
     
-    for member_id, documents in _MEMBER_DOCUMENTS.items():
-        member = get_member_by_id(member_id)
-        if member and member.kyc_status == KYCStatus.PENDING:
-            member_documents = get_member_documents(member_id)
+    # Sort by submission date
+    member_ids = sorted(_PENDING_MEMBERS, key=_MEMBER_FIRST_DOC_AT.__getitem__)
+    members = get_members_by_ids(member_ids)
+    
+    for member_id in member_ids:
+        member = members.get(member_id)
+        if member:
             pending_reviews.append({
                 "member": member,
-                "documents": member_documents,
-                "submitted_at": min(doc.created_at for doc in member_documents) if member_documents else member.created_at
+                "documents": get_member_documents(member_id),
+                "submitted_at": _MEMBER_FIRST_DOC_AT[member_id]
             })
     
-    # Sort by submission date
-    pending_reviews.sort(key=lambda x: x["submitted_at"])
-    
     return pending_reviews
 
 
@@ -207,33 +271,25 @@ def verify_document(document_id: str, verification_status: VerificationStatus, n
     document_record["verification_status"] = verification_status
     
     if verification_status == VerificationStatus.VERIFIED:
-        document_record["verified_at"] = datetime.utcnow()
+        document_record["verified_at"] = datetime.now(timezone.utc)
     
     logger.info("Updated document %s verification status: %s", document_id, verification_status)
     
+    document = _store_document_out(document_record)
+    
     # Try auto-verification after document update
     if verification_status == VerificationStatus.VERIFIED:
         auto_verify_basic_kyc(document_record["member_id"])
     
-    return KYCDocumentOut(**document_record)
+    return document
 
 
 def get_kyc_statistics() -> dict:
     """Get KYC statistics across all members."""
-    total_members = len(_MEMBER_DOCUMENTS)
-    verified_count = 0
-    pending_count = 0
-    rejected_count = 0
-    
-    for member_id in _MEMBER_DOCUMENTS.keys():
-        member = get_member_by_id(member_id)
-        if member:
-            if member.kyc_status == KYCStatus.VERIFIED:
-                verified_count += 1
-            elif member.kyc_status == KYCStatus.PENDING:
-                pending_count += 1
-            elif member.kyc_status == KYCStatus.REJECTED:
-                rejected_count += 1
+    total_members = len(_MEMBER_FIRST_DOC_AT)
+    verified_count = _KYC_COUNTS[KYCStatus.VERIFIED]
+    pending_count = _KYC_COUNTS[KYCStatus.PENDING]
+    rejected_count = _KYC_COUNTS[KYCStatus.REJECTED]
     
     return {
         "total_members": total_members,
@@ -1,69 +1,121 @@
+import heapq
+import hmac
 import logging
-import random
-import string
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+import secrets
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
 
+from app.core.config import settings
 from app.models.schemas import (
     OTPRequestIn, OTPRequestOut, OTPVerificationIn, OTPVerificationOut
 )
-from app.services.user_service import get_member_by_phone, update_member_verification_status
+from app.services.user_service import (
+    get_member_by_phone, get_total_member_count, get_verified_phone_count,
+    update_member_verification_status
+)
 from app.services.kyc_service import auto_verify_basic_kyc
-from app.utils.sms import send_sms
+from app.utils.sms import send_sms_async
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass(slots=True)
+class OTPRecord:
+    """An issued OTP awaiting verification."""
+    otp: str
+    expires_at: datetime
+    verification_type: str
+    attempts: int
+    last_request: datetime
+
+
 # In-memory storage for demo/development (replace with Redis in production)
-_OTP_STORE: Dict[str, dict] = {}  # phone_number -> {otp, expires_at, verification_type, attempts}
+_OTP_STORE: Dict[str, OTPRecord] = {}  # phone_number -> OTPRecord
+_OTP_REQUEST_COUNTS: Dict[str, Tuple[int, int]] = {}  # phone_number -> (hour_window, requests_in_window)
+_OTP_EXPIRY_HEAP: List[Tuple[datetime, str]] = []  # (expires_at, phone_number), soonest first
+_COUNTS_PRUNED_WINDOW = 0  # hour window in which _OTP_REQUEST_COUNTS was last pruned
 
 # Configuration
 OTP_LENGTH = 6
 OTP_EXPIRY_MINUTES = 10
 MAX_OTP_ATTEMPTS = 3
 RATE_LIMIT_MINUTES = 1  # Minimum time between OTP requests
+_OTP_EXPIRY_DELTA = timedelta(minutes=OTP_EXPIRY_MINUTES)
+_RATE_LIMIT_DELTA = timedelta(minutes=RATE_LIMIT_MINUTES)
+
+
+def _now() -> datetime:
+    """Current UTC time; the single clock for OTP expiry and rate limits."""
+    return datetime.now(timezone.utc)
+
+
+def _hour_window(now: datetime) -> int:
+    """Index of the fixed one-hour window the hourly OTP limit counts in."""
+    return int(now.timestamp()) // 3600
 
 
 def generate_otp(length: int = OTP_LENGTH) -> str:
     """Generate a random OTP code."""
-    return ''.join(random.choices(string.digits, k=length))
+    return f"{secrets.randbelow(10 ** length):0{length}d}"
 
 
-def request_otp(request_data: OTPRequestIn) -> OTPRequestOut:
+async def request_otp(request_data: OTPRequestIn) -> OTPRequestOut:
     """Request an OTP for phone verification."""
     logger.info("OTP requested for %s, type: %s", request_data.phone_number, request_data.verification_type)
     
     phone_number = request_data.phone_number
     verification_type = request_data.verification_type
     
+    # Evict expired OTPs as we go so the store never needs a periodic sweep
+    cleanup_expired_otps()
+    now = _now()
+    
     # Check rate limiting
     if phone_number in _OTP_STORE:
-        last_request = _OTP_STORE[phone_number].get("last_request")
-        if last_request and datetime.utcnow() - last_request < timedelta(minutes=RATE_LIMIT_MINUTES):
-            remaining_time = RATE_LIMIT_MINUTES - (datetime.utcnow() - last_request).total_seconds() / 60
+        last_request = _OTP_STORE[phone_number].last_request
+        if last_request and now - last_request < _RATE_LIMIT_DELTA:
+            remaining_time = RATE_LIMIT_MINUTES - (now - last_request).total_seconds() / 60
             return OTPRequestOut(
                 phone_number=phone_number,
                 otp_sent=False,
-                expires_at=datetime.utcnow(),
+                expires_at=now,
                 message=f"Please wait {remaining_time:.1f} minutes before requesting another OTP"
             )
     
+    # Check hourly limit (fixed one-hour window per phone number)
+    hour_window = _hour_window(now)
+    window, request_count = _OTP_REQUEST_COUNTS.get(phone_number, (hour_window, 0))
+    if window != hour_window:
+        request_count = 0
+    if request_count >= settings.OTP_RATE_LIMIT_PER_HOUR:
+        logger.warning("Hourly OTP limit reached for %s", phone_number)
+        return OTPRequestOut(
+            phone_number=phone_number,
+            otp_sent=False,
+            expires_at=now,
+            message="Too many OTP requests. Please try again later."
+        )
+    _OTP_REQUEST_COUNTS[phone_number] = (hour_window, request_count + 1)
+    
     # Generate OTP
     otp_code = generate_otp()
-    expires_at = datetime.utcnow() + timedelta(minutes=OTP_EXPIRY_MINUTES)
+    expires_at = now + _OTP_EXPIRY_DELTA
     
     # Store OTP
-    _OTP_STORE[phone_number] = {
-        "otp": otp_code,
-        "expires_at": expires_at,
-        "verification_type": verification_type,
-        "attempts": 0,
-        "last_request": datetime.utcnow()
-    }
+    _OTP_STORE[phone_number] = OTPRecord(
+        otp=otp_code,
+        expires_at=expires_at,
+        verification_type=verification_type,
+        attempts=0,
+        last_request=now
+    )
+    heapq.heappush(_OTP_EXPIRY_HEAP, (expires_at, phone_number))
     
     # Send SMS
     try:
         message = f"Your Harambee DAO verification code is: {otp_code}. Valid for {OTP_EXPIRY_MINUTES} minutes. Do not share this code."
-        sms_sent = send_sms(phone_number, message)
+        sms_sent = await send_sms_async(phone_number, message)
         
         if sms_sent:
             logger.info("OTP sent successfully to %s", phone_number)
@@ -113,48 +165,46 @@ def verify_otp(verification_data: OTPVerificationIn) -> OTPVerificationOut:
     otp_data = _OTP_STORE[phone_number]
     
     # Check if OTP expired
-    if datetime.utcnow() > otp_data["expires_at"]:
+    if _now() > otp_data.expires_at:
         logger.warning("Expired OTP for %s", phone_number)
         del _OTP_STORE[phone_number]
         return OTPVerificationOut(
             phone_number=phone_number,
             verified=False,
             verification_type=verification_type,
-            expires_at=otp_data["expires_at"]
+            expires_at=otp_data.expires_at
         )
     
-    # Check verification type matches
-    if otp_data["verification_type"] != verification_type:
-        logger.warning("Verification type mismatch for %s: expected %s, got %s", 
-                      phone_number, otp_data["verification_type"], verification_type)
+    # Increment attempts (before the type check so mismatched types still count)
+    otp_data.attempts += 1
+    
+    # Check max attempts
+    if otp_data.attempts > MAX_OTP_ATTEMPTS:
+        logger.warning("Max OTP attempts exceeded for %s", phone_number)
+        _OTP_STORE.pop(phone_number, None)
         return OTPVerificationOut(
             phone_number=phone_number,
             verified=False,
             verification_type=verification_type,
-            expires_at=otp_data["expires_at"]
+            expires_at=None
         )
     
-    # Increment attempts
-    otp_data["attempts"] += 1
-    
-    # Check max attempts
-    if otp_data["attempts"] > MAX_OTP_ATTEMPTS:
-        logger.warning("Max OTP attempts exceeded for %s", phone_number)
-        del _OTP_STORE[phone_number]
+    # Check verification type matches
+    if otp_data.verification_type != verification_type:
+        logger.warning("Verification type mismatch for %s: expected %s, got %s", 
+                      phone_number, otp_data.verification_type, verification_type)
         return OTPVerificationOut(
             phone_number=phone_number,
             verified=False,
             verification_type=verification_type,
-            expires_at=None
+            expires_at=otp_data.expires_at
         )
     
-    # Verify OTP
-    if provided_otp == otp_data["otp"]:
+    # Verify OTP; consuming it with pop makes a concurrent verify of the same code fail
+    if hmac.compare_digest(provided_otp.encode(), otp_data.otp.encode()) and _OTP_STORE.pop(phone_number, None) is otp_data:
         logger.info("OTP verified successfully for %s", phone_number)
         
-        # Remove OTP from store
-        expires_at = otp_data["expires_at"]
-        del _OTP_STORE[phone_number]
+        expires_at = otp_data.expires_at
         
         # Update member verification status if this is registration verification
         if verification_type == "registration":
@@ -174,12 +224,12 @@ def verify_otp(verification_data: OTPVerificationIn) -> OTPVerificationOut:
         )
     
     else:
-        logger.warning("Invalid OTP for %s (attempt %d/%d)", phone_number, otp_data["attempts"], MAX_OTP_ATTEMPTS)
+        logger.warning("Invalid OTP for %s (attempt %d/%d)", phone_number, otp_data.attempts, MAX_OTP_ATTEMPTS)
         return OTPVerificationOut(
             phone_number=phone_number,
             verified=False,
             verification_type=verification_type,
-            expires_at=otp_data["expires_at"]
+            expires_at=otp_data.expires_at
         )
 
 
@@ -195,52 +245,56 @@ def get_otp_status(phone_number: str) -> Optional[dict]:
         return None
     
     otp_data = _OTP_STORE[phone_number]
+    now = _now()
     
     # Check if expired
-    if datetime.utcnow() > otp_data["expires_at"]:
+    if now > otp_data.expires_at:
         del _OTP_STORE[phone_number]
         return None
     
     return {
         "phone_number": phone_number,
-        "verification_type": otp_data["verification_type"],
-        "expires_at": otp_data["expires_at"],
-        "attempts_remaining": MAX_OTP_ATTEMPTS - otp_data["attempts"],
-        "can_request_new": datetime.utcnow() - otp_data["last_request"] >= timedelta(minutes=RATE_LIMIT_MINUTES)
+        "verification_type": otp_data.verification_type,
+        "expires_at": otp_data.expires_at,
+        "attempts_remaining": MAX_OTP_ATTEMPTS - otp_data.attempts,
+        "can_request_new": now - otp_data.last_request >= _RATE_LIMIT_DELTA
     }
 
 
 def cleanup_expired_otps():
-    """Clean up expired OTPs from storage."""
-    current_time = datetime.utcnow()
-    expired_phones = []
+    """Clean up expired OTPs and past hourly request counts from storage."""
+    global _COUNTS_PRUNED_WINDOW
+    current_time = _now()
+    cleaned = 0
     
-    for phone_number, otp_data in _OTP_STORE.items():
-        if current_time > otp_data["expires_at"]:
-            expired_phones.append(phone_number)
+    # Only expired heap entries are touched; entries for OTPs that were
+    # re-requested or already consumed are stale and simply discarded
+    while _OTP_EXPIRY_HEAP and _OTP_EXPIRY_HEAP[0][0] < current_time:
+        expires_at, phone_number = heapq.heappop(_OTP_EXPIRY_HEAP)
+        otp_data = _OTP_STORE.get(phone_number)
+        if otp_data is not None and otp_data.expires_at == expires_at:
+            del _OTP_STORE[phone_number]
+            cleaned += 1
+            logger.debug("Cleaned up expired OTP for %s", phone_number)
     
-    for phone_number in expired_phones:
-        del _OTP_STORE[phone_number]
-        logger.debug("Cleaned up expired OTP for %s", phone_number)
+    if cleaned:
+        logger.info("Cleaned up %d expired OTPs", cleaned)
     
-    if expired_phones:
-        logger.info("Cleaned up %d expired OTPs", len(expired_phones))
+    # Counts from earlier hours no longer limit anything; sweep them once per hour
+    hour_window = _hour_window(current_time)
+    if hour_window != _COUNTS_PRUNED_WINDOW:
+        stale = [phone for phone, (window, _) in _OTP_REQUEST_COUNTS.items() if window != hour_window]
+        for phone_number in stale:
+            del _OTP_REQUEST_COUNTS[phone_number]
+        _COUNTS_PRUNED_WINDOW = hour_window
 
 
 def get_verification_statistics() -> dict:
     """Get phone verification statistics."""
+    cleanup_expired_otps()
     active_otps = len(_OTP_STORE)
-    
-    # Count verified phones (this would be more efficient with a database)
-    verified_count = 0
-    total_members = 0
-    
-    # This is a simplified count - in production, query the database directly
-    from app.services.user_service import _MEMBERS
-    for member_data in _MEMBERS.values():
-        total_members += 1
-        if member_data.get("phone_verified", False):
-            verified_count += 1
+    verified_count = get_verified_phone_count()
+    total_members = get_total_member_count()
     
     return {
         "total_members": total_members,
@@ -1,17 +1,52 @@
+import heapq
 import logging
 import uuid
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
 
 from app.models.schemas import ProposalIn, ProposalOut
-from app.services.user_service import get_group_by_id, get_group_members
-from app.services.sms_service import register_proposal_for_sms_voting, broadcast_proposal_sms
+from app.services.user_service import get_group_by_id, get_verified_member_phones
+from app.services.sms_service import register_proposal_for_sms_voting, broadcast_proposal_sms, close_proposal_voting, get_sms_short_code
+from app.utils.cache import invalidate, ttl_cached
 
 logger = logging.getLogger(__name__)
 
 # In-memory storage for demo/development (replace with database in production)
 _PROPOSALS: Dict[str, dict] = {}
 _GROUP_PROPOSALS: Dict[str, List[str]] = {}  # group_id -> [proposal_ids]
+_STATUS_INDEX: Dict[str, Set[str]] = defaultdict(set)  # status -> {proposal_ids}
+_VOTING_DEADLINE_HEAP: List[Tuple[datetime, str]] = []  # (voting_deadline, proposal_id), soonest first
+_PROPOSAL_OUT: Dict[str, ProposalOut] = {}  # proposal_id -> built response model, dropped on mutation
+_LISTING_CACHE_KEYS = ("proposals:active", "proposals:by_status")  # cached listings, dropped on any proposal write
+
+
+def _now() -> datetime:
+    """Current UTC time; the single clock for proposal deadlines."""
+    return datetime.now(timezone.utc)
+
+
+def _proposal_out(proposal_id: str) -> ProposalOut:
+    """Return the (frozen) response model for a stored proposal, building it once."""
+    proposal = _PROPOSAL_OUT.get(proposal_id)
+    if proposal is None:
+        proposal = _PROPOSAL_OUT[proposal_id] = ProposalOut(**_PROPOSALS[proposal_id])
+    return proposal
+
+
+def _set_status(proposal_id: str, status: str) -> None:
+    """Set a proposal's status and keep the status index in sync."""
+    proposal_record = _PROPOSALS[proposal_id]
+    if status == "VOTING" and proposal_record["status"] != "VOTING":
+        heapq.heappush(_VOTING_DEADLINE_HEAP, (proposal_record["voting_deadline"], proposal_id))
+    elif proposal_record["status"] == "VOTING" and status != "VOTING":
+        # Voting is over; free the SMS short code for reuse
+        close_proposal_voting(proposal_id)
+    _STATUS_INDEX[proposal_record["status"]].discard(proposal_id)
+    _STATUS_INDEX[status].add(proposal_id)
+    proposal_record["status"] = status
+    _PROPOSAL_OUT.pop(proposal_id, None)
+    invalidate(*_LISTING_CACHE_KEYS)
 
 
 def create_proposal(proposal_data: ProposalIn) -> ProposalOut:
@@ -27,7 +62,8 @@ def create_proposal(proposal_data: ProposalIn) -> ProposalOut:
     proposal_id = str(uuid.uuid4())
     
     # Calculate voting deadline (default 7 days from now if not specified)
-    voting_deadline = proposal_data.deadline if proposal_data.deadline > datetime.utcnow() else datetime.utcnow() + timedelta(days=7)
+    now = _now()
+    voting_deadline = proposal_data.deadline if proposal_data.deadline > now else now + timedelta(days=7)
     
     # Create proposal record
     proposal_record = {
@@ -39,7 +75,7 @@ def create_proposal(proposal_data: ProposalIn) -> ProposalOut:
         "milestone_description": proposal_data.milestone_description,
         "deadline": proposal_data.deadline,
         "created_by": proposal_data.created_by,
-        "created_at": datetime.utcnow(),
+        "created_at": now,
         "voting_deadline": voting_deadline,
         "status": "VOTING",  # DRAFT, VOTING, PASSED, FAILED, EXECUTED
         "vote_count": {"yes": 0, "no": 0, "total": 0}
@@ -47,38 +83,38 @@ def create_proposal(proposal_data: ProposalIn) -> ProposalOut:
     
     # Store proposal
     _PROPOSALS[proposal_id] = proposal_record
+    _STATUS_INDEX["VOTING"].add(proposal_id)
+    heapq.heappush(_VOTING_DEADLINE_HEAP, (voting_deadline, proposal_id))
     
     # Add to group proposals
     if proposal_data.group_id not in _GROUP_PROPOSALS:
         _GROUP_PROPOSALS[proposal_data.group_id] = []
     _GROUP_PROPOSALS[proposal_data.group_id].append(proposal_id)
+    invalidate(*_LISTING_CACHE_KEYS)
     
     logger.info("Created proposal %s", proposal_id)
     
-    return ProposalOut(**proposal_record)
+    return _proposal_out(proposal_id)
 
 
 def get_proposal_by_id(proposal_id: str) -> Optional[ProposalOut]:
     """Get proposal by ID."""
-    proposal_record = _PROPOSALS.get(proposal_id)
-    if proposal_record:
-        return ProposalOut(**proposal_record)
+    if proposal_id in _PROPOSALS:
+        return _proposal_out(proposal_id)
     return None
 
 
-def get_group_proposals(group_id: str) -> List[ProposalOut]:
-    """Get all proposals for a group."""
+def get_group_proposals(group_id: str, offset: int = 0, limit: Optional[int] = None) -> List[ProposalOut]:
+    """Get proposals for a group, optionally paginated."""
     proposal_ids = _GROUP_PROPOSALS.get(group_id, [])
-    proposals = []
-    
-    for proposal_id in proposal_ids:
-        if proposal_id in _PROPOSALS:
-            proposals.append(ProposalOut(**_PROPOSALS[proposal_id]))
+    proposal_ids = [proposal_id for proposal_id in proposal_ids if proposal_id in _PROPOSALS]
     
     # Sort by creation date (newest first)
-    proposals.sort(key=lambda p: p.created_at, reverse=True)
+    proposal_ids.sort(key=lambda pid: _PROPOSALS[pid]["created_at"], reverse=True)
+    if offset or limit is not None:
+        proposal_ids = proposal_ids[offset:None if limit is None else offset + limit]
     
-    return proposals
+    return [_proposal_out(proposal_id) for proposal_id in proposal_ids]
 
 
 def update_proposal_status(proposal_id: str, status: str) -> Optional[ProposalOut]:
@@ -86,10 +122,10 @@ def update_proposal_status(proposal_id: str, status: str) -> Optional[ProposalOu
     if proposal_id not in _PROPOSALS:
         return None
     
-    _PROPOSALS[proposal_id]["status"] = status
+    _set_status(proposal_id, status)
     logger.info("Updated proposal %s status to %s", proposal_id, status)
     
-    return ProposalOut(**_PROPOSALS[proposal_id])
+    return _proposal_out(proposal_id)
 
 
 def update_proposal_vote_count(proposal_id: str, vote_count: dict) -> Optional[ProposalOut]:
@@ -98,22 +134,24 @@ def update_proposal_vote_count(proposal_id: str, vote_count: dict) -> Optional[P
         return None
     
     _PROPOSALS[proposal_id]["vote_count"] = vote_count
+    _PROPOSAL_OUT.pop(proposal_id, None)
+    invalidate(*_LISTING_CACHE_KEYS)
     
     # Auto-update status based on vote count and deadline
     proposal = _PROPOSALS[proposal_id]
-    if datetime.utcnow() > proposal["voting_deadline"]:
+    if _now() > proposal["voting_deadline"]:
         total_votes = vote_count.get("total", 0)
         yes_votes = vote_count.get("yes", 0)
         
         # Simple majority rule (can be customized per group)
         if total_votes > 0 and yes_votes > total_votes / 2:
-            proposal["status"] = "PASSED"
+            _set_status(proposal_id, "PASSED")
         else:
-            proposal["status"] = "FAILED"
+            _set_status(proposal_id, "FAILED")
         
         logger.info("Auto-updated proposal %s status to %s based on votes", proposal_id, proposal["status"])
     
-    return ProposalOut(**_PROPOSALS[proposal_id])
+    return _proposal_out(proposal_id)
 
 
 def start_sms_voting(proposal_id: str) -> dict:
@@ -122,24 +160,23 @@ def start_sms_voting(proposal_id: str) -> dict:
     if not proposal:
         raise ValueError(f"Proposal {proposal_id} not found")
     
-    # Register proposal for SMS voting
-    short_code = register_proposal_for_sms_voting(
-        proposal_id=proposal_id,
-        proposal_title=proposal.title,
-        group_id=proposal.group_id,
-        voting_deadline=proposal.voting_deadline
-    )
-    
-    # Get group members
-    members_list = get_group_members(proposal.group_id)
-    verified_members = [m for m in members_list.members if m.phone_verified]
-    
-    if not verified_members:
+    # Register proposal for SMS voting; a rerun keeps the existing registration
+    # so its short code and the members already messaged carry over
+    short_code = get_sms_short_code(proposal_id)
+    if short_code is None:
+        short_code = register_proposal_for_sms_voting(
+            proposal_id=proposal_id,
+            proposal_title=proposal.title,
+            group_id=proposal.group_id,
+            voting_deadline=proposal.voting_deadline
+        )
+    
+    # Get verified members' phone numbers
+    phone_numbers = get_verified_member_phones(proposal.group_id)
+    
+    if not phone_numbers:
         raise ValueError("No verified members found in group")
     
-    # Extract phone numbers
-    phone_numbers = [member.phone_number for member in verified_members]
-    
     # Broadcast SMS
     broadcast_result = broadcast_proposal_sms(proposal_id, phone_numbers)
     
@@ -149,54 +186,50 @@ def start_sms_voting(proposal_id: str) -> dict:
         "proposal_id": proposal_id,
         "short_code": short_code,
         "broadcast_result": broadcast_result,
-        "eligible_voters": len(verified_members)
+        "eligible_voters": len(phone_numbers)
     }
 
 
-def get_active_proposals() -> List[ProposalOut]:
-    """Get all active proposals (status = VOTING)."""
-    active_proposals = []
-    
-    for proposal_record in _PROPOSALS.values():
-        if proposal_record["status"] == "VOTING":
-            active_proposals.append(ProposalOut(**proposal_record))
+@ttl_cached("proposals:active")
+def get_active_proposals(offset: int = 0, limit: Optional[int] = None) -> List[ProposalOut]:
+    """Get active proposals (status = VOTING), optionally paginated."""
+    proposal_ids = sorted(_STATUS_INDEX["VOTING"], key=lambda pid: _PROPOSALS[pid]["voting_deadline"])
     
-    # Sort by voting deadline (soonest first)
-    active_proposals.sort(key=lambda p: p.voting_deadline)
+    # Sorted by voting deadline (soonest first)
+    if offset or limit is not None:
+        proposal_ids = proposal_ids[offset:None if limit is None else offset + limit]
     
-    return active_proposals
+    return [_proposal_out(proposal_id) for proposal_id in proposal_ids]
 
 
+@ttl_cached("proposals:by_status")
 def get_proposals_by_status(status: str) -> List[ProposalOut]:
     """Get proposals by status."""
-    proposals = []
-    
-    for proposal_record in _PROPOSALS.values():
-        if proposal_record["status"] == status:
-            proposals.append(ProposalOut(**proposal_record))
-    
-    # Sort by creation date (newest first)
-    proposals.sort(key=lambda p: p.created_at, reverse=True)
+    proposal_ids = sorted(_STATUS_INDEX.get(status, ()), key=lambda pid: _PROPOSALS[pid]["created_at"], reverse=True)
     
-    return proposals
+    # Sorted by creation date (newest first)
+    return [_proposal_out(proposal_id) for proposal_id in proposal_ids]
 
 
 def check_voting_deadlines():
     """Check and update proposals that have passed their voting deadline."""
-    current_time = datetime.utcnow()
+    current_time = _now()
     updated_count = 0
     
-    for proposal_id, proposal_record in _PROPOSALS.items():
-        if (proposal_record["status"] == "VOTING" and 
-            current_time > proposal_record["voting_deadline"]):
-            
-            # Get current vote tally
-            from app.services.vote_service import get_vote_tally
-            vote_tally = get_vote_tally(proposal_id)
-            
-            # Update vote count and status
-            update_proposal_vote_count(proposal_id, vote_tally)
-            updated_count += 1
+    # Pop only proposals whose deadline has passed; entries for proposals that
+    # were deleted or already left VOTING are skipped
+    while _VOTING_DEADLINE_HEAP and current_time > _VOTING_DEADLINE_HEAP[0][0]:
+        _, proposal_id = heapq.heappop(_VOTING_DEADLINE_HEAP)
+        if proposal_id not in _STATUS_INDEX["VOTING"]:
+            continue
+        
+        # Get current vote tally
+        from app.services.vote_service import get_vote_tally
+        vote_tally = get_vote_tally(proposal_id)
+        
+        # Update vote count and status
+        update_proposal_vote_count(proposal_id, vote_tally)
+        updated_count += 1
     
     if updated_count > 0:
         logger.info("Updated %d proposals that passed voting deadline", updated_count)
@@ -204,14 +237,11 @@ def check_voting_deadlines():
     return updated_count
 
 
+@ttl_cached("stats:proposals")
 def get_proposal_statistics() -> dict:
     """Get proposal statistics."""
     total_proposals = len(_PROPOSALS)
-    status_counts = {}
-    
-    for proposal_record in _PROPOSALS.values():
-        status = proposal_record["status"]
-        status_counts[status] = status_counts.get(status, 0) + 1
+    status_counts = {status: len(proposal_ids) for status, proposal_ids in _STATUS_INDEX.items() if proposal_ids}
     
     return {
         "total_proposals": total_proposals,
@@ -232,6 +262,10 @@ def delete_proposal(proposal_id: str) -> bool:
     
     # Remove from proposals
     del _PROPOSALS[proposal_id]
+    _PROPOSAL_OUT.pop(proposal_id, None)
+    _STATUS_INDEX[proposal["status"]].discard(proposal_id)
+    close_proposal_voting(proposal_id)
+    invalidate(*_LISTING_CACHE_KEYS)
     
     # Remove from group proposals
     if group_id in _GROUP_PROPOSALS:
@@ -243,19 +277,18 @@ def delete_proposal(proposal_id: str) -> bool:
 
 def get_member_voting_history(member_id: str) -> List[dict]:
     """Get voting history for a member."""
-    from app.services.vote_service import _VOTES
+    from app.services.vote_service import get_member_votes
     
     voting_history = []
     
-    for proposal_id, votes in _VOTES.items():
-        if member_id in votes:
-            proposal = get_proposal_by_id(proposal_id)
-            if proposal:
-                voting_history.append({
-                    "proposal": proposal,
-                    "vote": votes[member_id],
-                    "voted_at": proposal.created_at  # In production, store actual vote timestamp
-                })
+    for proposal_id, vote in get_member_votes(member_id).items():
+        if proposal_id in _PROPOSALS:
+            proposal = _proposal_out(proposal_id)
+            voting_history.append({
+                "proposal": proposal,
+                "vote": vote,
+                "voted_at": proposal.created_at  # In production, store actual vote timestamp
+            })
     
     # Sort by vote date (newest first)
     voting_history.sort(key=lambda v: v["voted_at"], reverse=True)
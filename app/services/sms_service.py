@@ -1,26 +1,63 @@
 import logging
 import re
-from datetime import datetime
-from typing import Optional, Dict, List
+import secrets
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import repeat
+from typing import Deque, Optional, Dict, List
 
 from app.models.schemas import (
     TwilioWebhookIn, SMSVoteIn, SMSVoteOut, VoteIn
 )
 from app.services.user_service import get_member_by_phone
 from app.services.vote_service import record_vote, get_vote_tally
+from app.utils.cache import ttl_cached
 from app.utils.sms import send_sms
 
 logger = logging.getLogger(__name__)
 
+# Pattern: YES### or NO### where ### is 3-4 digits
+_VOTE_RE = re.compile(r'^(YES|NO)(\d{3,4})$')
+
+_BROADCAST_MAX_WORKERS = 32
+_SHORT_CODE_SPACE = 10_000  # 4-digit codes, 0000-9999
+
+# Background sender for vote confirmations so webhooks don't wait on Twilio
+_SMS_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="sms")
+
+# Static SMS replies
+_MSG_UNREGISTERED = "❌ Phone number not registered. Please register first at harambeedao.com"
+_MSG_UNVERIFIED = "❌ Phone number not verified. Please complete verification first."
+_MSG_INVALID_FORMAT = "❌ Invalid vote format. Use YES#### or NO#### (e.g., YES1234)"
+_MSG_VOTE_ERROR = "❌ Error recording vote. Please try again."
+
 # In-memory storage for demo/development
 _ACTIVE_PROPOSALS: Dict[str, dict] = {}  # proposal_id -> proposal_info
-_SMS_LOGS: List[dict] = []  # SMS interaction logs
+_SHORT_CODE_TO_PROPOSAL: Dict[str, str] = {}  # short_code -> proposal_id
+_SMS_LOGS: Deque[dict] = deque(maxlen=10_000)  # most recent SMS interaction logs
+_SMS_INTERACTION_COUNTS: Counter = Counter()  # interaction_type -> all-time count
 
 
 def register_proposal_for_sms_voting(proposal_id: str, proposal_title: str, group_id: str, voting_deadline: datetime) -> str:
     """Register a proposal for SMS voting and generate a short code."""
-    # Generate a short code (3-4 digits)
-    short_code = str(len(_ACTIVE_PROPOSALS) + 1).zfill(3)
+    if len(_SHORT_CODE_TO_PROPOSAL) >= _SHORT_CODE_SPACE:
+        raise ValueError("No SMS short codes available; close finished votes first")
+    
+    # Generate a random 4-digit short code, retrying on collision with an active proposal
+    while True:
+        short_code = f"{secrets.randbelow(_SHORT_CODE_SPACE):04d}"
+        if short_code not in _SHORT_CODE_TO_PROPOSAL:
+            break
+    
+    # The broadcast text is the same for every recipient, so build it once here
+    message = (
+        f"🗳️ HARAMBEE DAO VOTE\n"
+        f"Proposal: {proposal_title}\n"
+        f"Vote by {voting_deadline.strftime('%Y-%m-%d %H:%M')}\n"
+        f"Reply: YES{short_code} or NO{short_code}\n"
+        f"Example: YES{short_code}"
+    )
     
     proposal_info = {
         "proposal_id": proposal_id,
@@ -28,10 +65,18 @@ def register_proposal_for_sms_voting(proposal_id: str, proposal_title: str, grou
         "title": proposal_title,
         "group_id": group_id,
         "voting_deadline": voting_deadline,
-        "created_at": datetime.utcnow()
+        "broadcast_message": message,
+        "sent_to": set(),  # phones that already received the broadcast
+        "created_at": datetime.now(timezone.utc)
     }
     
+    # A re-registered proposal gives up its previous code
+    previous = _ACTIVE_PROPOSALS.get(proposal_id)
+    if previous is not None:
+        _SHORT_CODE_TO_PROPOSAL.pop(previous["short_code"], None)
+    
     _ACTIVE_PROPOSALS[proposal_id] = proposal_info
+    _SHORT_CODE_TO_PROPOSAL[short_code] = proposal_id
     
     logger.info("Registered proposal %s for SMS voting with code %s", proposal_id, short_code)
     return short_code
@@ -43,33 +88,23 @@ def broadcast_proposal_sms(proposal_id: str, member_phones: List[str]) -> dict:
         raise ValueError(f"Proposal {proposal_id} not registered for SMS voting")
     
     proposal = _ACTIVE_PROPOSALS[proposal_id]
-    short_code = proposal["short_code"]
-    title = proposal["title"]
-    deadline = proposal["voting_deadline"]
+    message = proposal["broadcast_message"]
+    sent_to = proposal["sent_to"]
     
-    # Create SMS message
-    message = (
-        f"🗳️ HARAMBEE DAO VOTE\n"
-        f"Proposal: {title}\n"
-        f"Vote by {deadline.strftime('%Y-%m-%d %H:%M')}\n"
-        f"Reply: YES{short_code} or NO{short_code}\n"
-        f"Example: YES{short_code}"
-    )
+    # Drop duplicate numbers and anyone already reached by an earlier broadcast
+    member_phones = list(dict.fromkeys(member_phones))
+    pending_phones = [phone for phone in member_phones if phone not in sent_to]
     
-    sent_count = 0
-    failed_count = 0
+    # Sends are network-bound, so fan them out across a thread pool
+    if pending_phones:
+        with ThreadPoolExecutor(max_workers=min(_BROADCAST_MAX_WORKERS, len(pending_phones))) as executor:
+            results = list(executor.map(_send_proposal_sms, pending_phones, repeat(message)))
+    else:
+        results = []
     
-    for phone in member_phones:
-        try:
-            if send_sms(phone, message):
-                sent_count += 1
-                logger.debug("Sent proposal SMS to %s", phone)
-            else:
-                failed_count += 1
-                logger.warning("Failed to send proposal SMS to %s", phone)
-        except Exception as e:
-            failed_count += 1
-            logger.error("Error sending proposal SMS to %s: %s", phone, e)
+    sent_to.update(phone for phone, sent in zip(pending_phones, results) if sent)
+    sent_count = sum(results)
+    failed_count = len(results) - sent_count
     
     # Log broadcast
     _SMS_LOGS.append({
@@ -77,7 +112,7 @@ def broadcast_proposal_sms(proposal_id: str, member_phones: List[str]) -> dict:
         "proposal_id": proposal_id,
         "sent_count": sent_count,
         "failed_count": failed_count,
-        "timestamp": datetime.utcnow()
+        "timestamp": datetime.now(timezone.utc)
     })
     
     logger.info("Broadcast proposal %s: %d sent, %d failed", proposal_id, sent_count, failed_count)
@@ -86,13 +121,25 @@ def broadcast_proposal_sms(proposal_id: str, member_phones: List[str]) -> dict:
         "proposal_id": proposal_id,
         "sent_count": sent_count,
         "failed_count": failed_count,
+        "already_sent_count": len(member_phones) - len(pending_phones),
         "total_recipients": len(member_phones)
     }
 
 
+def _send_proposal_sms(phone: str, message: str) -> bool:
+    """Send a single proposal SMS, logging the outcome."""
+    try:
+        if send_sms(phone, message):
+            return True
+        logger.warning("Failed to send proposal SMS to %s", phone)
+    except Exception as e:
+        logger.error("Error sending proposal SMS to %s: %s", phone, e)
+    return False
+
+
 def process_sms_webhook(webhook_data: TwilioWebhookIn) -> SMSVoteOut:
     """Process incoming SMS webhook from Twilio."""
-    logger.info("Processing SMS from %s: %s", webhook_data.From, webhook_data.Body)
+    logger.debug("Processing SMS from %s: %s", webhook_data.From, webhook_data.Body)
     
     sms_vote = SMSVoteIn(
         phone_number=webhook_data.From,
@@ -106,12 +153,12 @@ def process_sms_webhook(webhook_data: TwilioWebhookIn) -> SMSVoteOut:
 def process_sms_vote(sms_data: SMSVoteIn) -> SMSVoteOut:
     """Process an SMS vote message."""
     phone_number = sms_data.phone_number
-    message_body = sms_data.message_body.strip().upper()
+    message_body = sms_data.message_body  # normalized by process_sms_webhook
     
     # Get member by phone
     member = get_member_by_phone(phone_number)
     if not member:
-        response_msg = "❌ Phone number not registered. Please register first at harambeedao.com"
+        response_msg = _MSG_UNREGISTERED
         _log_sms_interaction(phone_number, message_body, "unregistered_phone", response_msg)
         return SMSVoteOut(
             phone_number=phone_number,
@@ -125,7 +172,7 @@ def process_sms_vote(sms_data: SMSVoteIn) -> SMSVoteOut:
     
     # Check if member is verified
     if not member.phone_verified:
-        response_msg = "❌ Phone number not verified. Please complete verification first."
+        response_msg = _MSG_UNVERIFIED
         _log_sms_interaction(phone_number, message_body, "unverified_phone", response_msg)
         return SMSVoteOut(
             phone_number=phone_number,
@@ -141,7 +188,7 @@ def process_sms_vote(sms_data: SMSVoteIn) -> SMSVoteOut:
     vote_result = _parse_vote_message(message_body)
     
     if not vote_result:
-        response_msg = "❌ Invalid vote format. Use YES### or NO### (e.g., YES001)"
+        response_msg = _MSG_INVALID_FORMAT
         _log_sms_interaction(phone_number, message_body, "invalid_format", response_msg)
         return SMSVoteOut(
             phone_number=phone_number,
@@ -172,7 +219,7 @@ def process_sms_vote(sms_data: SMSVoteIn) -> SMSVoteOut:
     
     # Check if proposal is still active
     proposal = _ACTIVE_PROPOSALS[proposal_id]
-    if datetime.utcnow() > proposal["voting_deadline"]:
+    if datetime.now(timezone.utc) > proposal["voting_deadline"]:
         response_msg = f"❌ Voting deadline passed for proposal {short_code}"
         _log_sms_interaction(phone_number, message_body, "deadline_passed", response_msg)
         return SMSVoteOut(
@@ -206,11 +253,8 @@ def process_sms_vote(sms_data: SMSVoteIn) -> SMSVoteOut:
         
         _log_sms_interaction(phone_number, message_body, "vote_recorded", response_msg)
         
-        # Send confirmation SMS
-        try:
-            send_sms(phone_number, response_msg)
-        except Exception as e:
-            logger.warning("Failed to send confirmation SMS to %s: %s", phone_number, e)
+        # Send confirmation SMS without blocking the webhook response
+        _SMS_EXECUTOR.submit(_send_confirmation_sms, phone_number, response_msg)
         
         return SMSVoteOut(
             phone_number=phone_number,
@@ -227,7 +271,7 @@ def process_sms_vote(sms_data: SMSVoteIn) -> SMSVoteOut:
         if "already voted" in error_msg.lower():
             response_msg = f"❌ You already voted on proposal {short_code}"
         else:
-            response_msg = "❌ Error recording vote. Please try again."
+            response_msg = _MSG_VOTE_ERROR
         
         _log_sms_interaction(phone_number, message_body, "vote_error", response_msg)
         
@@ -242,11 +286,17 @@ def process_sms_vote(sms_data: SMSVoteIn) -> SMSVoteOut:
         )
 
 
+def _send_confirmation_sms(phone_number: str, message: str) -> None:
+    """Send a vote confirmation SMS, logging any failure."""
+    try:
+        send_sms(phone_number, message)
+    except Exception as e:
+        logger.warning("Failed to send confirmation SMS to %s: %s", phone_number, e)
+
+
 def _parse_vote_message(message: str) -> Optional[tuple]:
     """Parse vote message to extract vote and proposal code."""
-    # Pattern: YES### or NO### where ### is 3-4 digits
-    pattern = r'^(YES|NO)(\d{3,4})$'
-    match = re.match(pattern, message)
+    match = _VOTE_RE.match(message)
     
     if match:
         vote_text, code = match.groups()
@@ -258,33 +308,26 @@ def _parse_vote_message(message: str) -> Optional[tuple]:
 
 def _find_proposal_by_short_code(short_code: str) -> Optional[str]:
     """Find proposal ID by short code."""
-    for proposal_id, proposal_info in _ACTIVE_PROPOSALS.items():
-        if proposal_info["short_code"] == short_code:
-            return proposal_id
-    return None
+    return _SHORT_CODE_TO_PROPOSAL.get(short_code)
 
 
 def _log_sms_interaction(phone_number: str, message: str, interaction_type: str, response: str):
     """Log SMS interaction for debugging and analytics."""
+    _SMS_INTERACTION_COUNTS[interaction_type] += 1
     _SMS_LOGS.append({
         "phone_number": phone_number,
         "message": message,
         "interaction_type": interaction_type,
         "response": response,
-        "timestamp": datetime.utcnow()
+        "timestamp": datetime.now(timezone.utc)
     })
 
 
+@ttl_cached("stats:sms")
 def get_sms_statistics() -> dict:
     """Get SMS interaction statistics."""
-    total_interactions = len(_SMS_LOGS)
-    
-    # Count by interaction type
-    type_counts = {}
-    for log in _SMS_LOGS:
-        interaction_type = log["interaction_type"]
-        type_counts[interaction_type] = type_counts.get(interaction_type, 0) + 1
-    
+    type_counts = dict(_SMS_INTERACTION_COUNTS)
+    total_interactions = sum(type_counts.values())
     successful_votes = type_counts.get("vote_recorded", 0)
     
     return {
@@ -296,6 +339,12 @@ def get_sms_statistics() -> dict:
     }
 
 
+def get_sms_short_code(proposal_id: str) -> Optional[str]:
+    """Get the short code of a proposal registered for SMS voting, if any."""
+    proposal = _ACTIVE_PROPOSALS.get(proposal_id)
+    return proposal["short_code"] if proposal is not None else None
+
+
 def get_proposal_voting_status(proposal_id: str) -> Optional[dict]:
     """Get voting status for a proposal."""
     if proposal_id not in _ACTIVE_PROPOSALS:
@@ -309,7 +358,7 @@ def get_proposal_voting_status(proposal_id: str) -> Optional[dict]:
         "short_code": proposal["short_code"],
         "title": proposal["title"],
         "voting_deadline": proposal["voting_deadline"],
-        "is_active": datetime.utcnow() <= proposal["voting_deadline"],
+        "is_active": datetime.now(timezone.utc) <= proposal["voting_deadline"],
         "vote_tally": tally
     }
 
@@ -317,7 +366,14 @@ def get_proposal_voting_status(proposal_id: str) -> Optional[dict]:
 def close_proposal_voting(proposal_id: str) -> bool:
     """Close voting for a proposal."""
     if proposal_id in _ACTIVE_PROPOSALS:
-        del _ACTIVE_PROPOSALS[proposal_id]
+        short_code = _ACTIVE_PROPOSALS.pop(proposal_id)["short_code"]
+        if _SHORT_CODE_TO_PROPOSAL.get(short_code) == proposal_id:
+            del _SHORT_CODE_TO_PROPOSAL[short_code]
         logger.info("Closed voting for proposal %s", proposal_id)
         return True
     return False
+
+
+def shutdown_sms_executor() -> None:
+    """Wait for queued confirmation SMS and stop the worker threads (called on app shutdown)."""
+    _SMS_EXECUTOR.shutdown(wait=True)
@@ -1,6 +1,8 @@
+import itertools
 import logging
+import sys
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
 from collections import defaultdict
 
@@ -9,14 +11,47 @@ from app.models.schemas import (
     KYCStatus, MemberRole, VerificationStatus, MemberListOut,
     GroupMembershipOut
 )
+from app.utils.cache import invalidate, ttl_cached
 
 logger = logging.getLogger(__name__)
 
+# Group and member IDs use the same scheme as KYC document IDs: a random
+# per-process high half plus a counter, keeping the UUID-shaped API strings
+_GROUP_ID_BASE = uuid.uuid4().int >> 64 << 64
+_GROUP_ID_SEQ = itertools.count(1)
+_MEMBER_ID_BASE = uuid.uuid4().int >> 64 << 64
+_MEMBER_ID_SEQ = itertools.count(1)
+
 # In-memory storage for demo/development (replace with database in production)
 _GROUPS: Dict[str, dict] = {}
 _MEMBERS: Dict[str, dict] = {}
 _GROUP_MEMBERS: Dict[str, List[str]] = defaultdict(list)  # group_id -> [member_ids]
 _PHONE_TO_MEMBER: Dict[str, str] = {}  # phone_number -> member_id
+_VERIFIED_PHONE_COUNT = 0  # members with phone_verified=True
+_MEMBER_OUT: Dict[str, MemberOut] = {}  # member_id -> built response model, rebuilt on mutation
+_GROUP_OUT: Dict[str, GroupOut] = {}  # group_id -> built response model, rebuilt on mutation
+_GROUP_COUNTERS: Dict[str, Dict[str, int]] = defaultdict(lambda: {"verified": 0, "pending_kyc": 0})
+
+
+def _member_bucket(member_record: dict) -> Optional[str]:
+    """Return which group counter (if any) a member record counts towards."""
+    if member_record["phone_verified"] and member_record["kyc_status"] == KYCStatus.VERIFIED:
+        return "verified"
+    if member_record["kyc_status"] == KYCStatus.PENDING:
+        return "pending_kyc"
+    return None
+
+
+def _store_member_out(member_record: dict) -> MemberOut:
+    """Build and cache the response model for a member record."""
+    _MEMBER_OUT[member_record["member_id"]] = member = MemberOut(**member_record)
+    return member
+
+
+def _store_group_out(group_record: dict) -> GroupOut:
+    """Build and cache the response model for a group record."""
+    _GROUP_OUT[group_record["group_id"]] = group = GroupOut(**group_record)
+    return group
 
 
 def create_group(group_data: GroupIn) -> GroupOut:
@@ -28,7 +63,8 @@ def create_group(group_data: GroupIn) -> GroupOut:
         raise ValueError(f"Phone number {group_data.leader_phone} is already registered")
     
     # Generate group ID
-    group_id = str(uuid.uuid4())
+    # Interned so every member record of the group shares this one string
+    group_id = sys.intern(str(uuid.UUID(int=_GROUP_ID_BASE | next(_GROUP_ID_SEQ))))
     
     # Create group record
     group_record = {
@@ -40,11 +76,12 @@ def create_group(group_data: GroupIn) -> GroupOut:
         "member_count": 0,
         "treasury_address": None,  # Will be set when Safe is deployed
         "treasury_threshold": group_data.treasury_threshold,
-        "created_at": datetime.utcnow(),
+        "created_at": datetime.now(timezone.utc),
         "kyc_status": KYCStatus.PENDING
     }
     
-    # Create leader as first member
+    # Validate the leader before storing anything, so a rejected leader
+    # never leaves a half-created group behind
     leader_data = MemberIn(
         phone_number=group_data.leader_phone,
         full_name=group_data.leader_name,
@@ -53,15 +90,21 @@ def create_group(group_data: GroupIn) -> GroupOut:
         role=MemberRole.LEADER
     )
     
-    leader = register_member(leader_data)
-    group_record["leader_id"] = leader.member_id
-    group_record["member_count"] = 1
-    
+    # Store the group first so the leader can be registered into it
     _GROUPS[group_id] = group_record
     
+    try:
+        leader = register_member(leader_data)
+    except ValueError:
+        del _GROUPS[group_id]
+        _GROUP_OUT.pop(group_id, None)
+        raise
+    group_record["leader_id"] = leader.member_id
+    invalidate("groups:all")
+    
     logger.info("Created group %s with leader %s", group_id, leader.member_id)
     
-    return GroupOut(**group_record)
+    return _store_group_out(group_record)
 
 
 def register_member(member_data: MemberIn) -> MemberOut:
@@ -72,47 +115,58 @@ def register_member(member_data: MemberIn) -> MemberOut:
     if member_data.group_id not in _GROUPS:
         raise ValueError(f"Group {member_data.group_id} does not exist")
     
-    # Check if phone already registered
-    if member_data.phone_number in _PHONE_TO_MEMBER:
-        raise ValueError(f"Phone number {member_data.phone_number} is already registered")
-    
     # Generate member ID
-    member_id = str(uuid.uuid4())
+    member_id = str(uuid.UUID(int=_MEMBER_ID_BASE | next(_MEMBER_ID_SEQ)))
+    
+    # Claim the phone number in one atomic step so concurrent registrations
+    # of the same number cannot both pass a separate check-then-assign
+    if _PHONE_TO_MEMBER.setdefault(member_data.phone_number, member_id) != member_id:
+        raise ValueError(f"Phone number {member_data.phone_number} is already registered")
     
     # Create member record
     member_record = {
         "member_id": member_id,
         "phone_number": member_data.phone_number,
         "full_name": member_data.full_name,
-        "group_id": member_data.group_id,
-        "location": member_data.location,
+        # Shared across many members: keep one copy of each string
+        "group_id": sys.intern(member_data.group_id),
+        "location": sys.intern(member_data.location) if member_data.location is not None else None,
         "role": member_data.role,
         "phone_verified": False,
         "kyc_status": KYCStatus.PENDING,
-        "created_at": datetime.utcnow(),
+        "created_at": datetime.now(timezone.utc),
         "last_active": None
     }
     
     # Store member
     _MEMBERS[member_id] = member_record
-    _PHONE_TO_MEMBER[member_data.phone_number] = member_id
     _GROUP_MEMBERS[member_data.group_id].append(member_id)
+    _GROUP_COUNTERS[member_data.group_id]["pending_kyc"] += 1
     
-    # Update group member count
-    if member_data.group_id in _GROUPS:
-        _GROUPS[member_data.group_id]["member_count"] += 1
+    # Update group member count (group existence was validated above)
+    group_record = _GROUPS[member_data.group_id]
+    group_record["member_count"] += 1
+    # A group being created is published by create_group once its leader is set
+    if member_data.group_id in _GROUP_OUT:
+        _store_group_out(group_record)
+    invalidate("groups:all")
     
     logger.info("Registered member %s", member_id)
     
-    return MemberOut(**member_record)
+    return _store_member_out(member_record)
 
 
 def get_member_by_id(member_id: str) -> Optional[MemberOut]:
     """Get member by ID."""
-    member_record = _MEMBERS.get(member_id)
-    if member_record:
-        return MemberOut(**member_record)
-    return None
+    return _MEMBER_OUT.get(member_id)
+
+
+def get_members_by_ids(member_ids: List[str]) -> Dict[str, MemberOut]:
+    """Get several members by ID in one pass (unknown IDs are skipped)."""
+    return {
+        member_id: _MEMBER_OUT[member_id]
+        for member_id in member_ids if member_id in _MEMBER_OUT
+    }
 
 
 def get_member_by_phone(phone_number: str) -> Optional[MemberOut]:
@@ -134,13 +188,13 @@ def update_member(member_id: str, update_data: MemberUpdateIn) -> Optional[Membe
     if update_data.full_name is not None:
         member_record["full_name"] = update_data.full_name
     if update_data.location is not None:
-        member_record["location"] = update_data.location
+        member_record["location"] = sys.intern(update_data.location)
     if update_data.role is not None:
         member_record["role"] = update_data.role
     
     logger.info("Updated member %s", member_id)
     
-    return MemberOut(**member_record)
+    return _store_member_out(member_record)
 
 
 def get_group_members(group_id: str) -> MemberListOut:
@@ -148,45 +202,46 @@ def get_group_members(group_id: str) -> MemberListOut:
     if group_id not in _GROUPS:
         raise ValueError(f"Group {group_id} does not exist")
     
-    member_ids = _GROUP_MEMBERS.get(group_id, [])
-    members = []
-    verified_count = 0
-    pending_kyc_count = 0
-    
-    for member_id in member_ids:
-        if member_id in _MEMBERS:
-            member = MemberOut(**_MEMBERS[member_id])
-            members.append(member)
-            
-            if member.phone_verified and member.kyc_status == KYCStatus.VERIFIED:
-                verified_count += 1
-            elif member.kyc_status == KYCStatus.PENDING:
-                pending_kyc_count += 1
+    members = [_MEMBER_OUT[member_id] for member_id in _GROUP_MEMBERS.get(group_id, [])]
+    counters = _GROUP_COUNTERS[group_id]
     
     return MemberListOut(
         members=members,
         total_count=len(members),
-        verified_count=verified_count,
-        pending_kyc_count=pending_kyc_count
+        verified_count=counters["verified"],
+        pending_kyc_count=counters["pending_kyc"]
     )
 
 
+def get_verified_member_phones(group_id: str) -> List[str]:
+    """Get phone numbers of a group's phone-verified members."""
+    if group_id not in _GROUPS:
+        raise ValueError(f"Group {group_id} does not exist")
+    
+    phone_numbers = []
+    for member_id in _GROUP_MEMBERS.get(group_id, []):
+        member_record = _MEMBERS.get(member_id)
+        if member_record is not None and member_record["phone_verified"]:
+            phone_numbers.append(member_record["phone_number"])
+    return phone_numbers
+
+
 def get_group_by_id(group_id: str) -> Optional[GroupOut]:
     """Get group by ID."""
-    group_record = _GROUPS.get(group_id)
-    if group_record:
-        return GroupOut(**group_record)
-    return None
+    return _GROUP_OUT.get(group_id)
 
 
 def update_member_verification_status(member_id: str, phone_verified: bool = None, kyc_status: KYCStatus = None) -> Optional[MemberOut]:
     """Update member verification status."""
-    if member_id not in _MEMBERS:
+    global _VERIFIED_PHONE_COUNT
+    member_record = _MEMBERS.get(member_id)
+    if not member_record:
         return None
     
-    member_record = _MEMBERS[member_id]
+    old_bucket = _member_bucket(member_record)
     
     if phone_verified is not None:
+        _VERIFIED_PHONE_COUNT += int(phone_verified) - int(member_record["phone_verified"])
         member_record["phone_verified"] = phone_verified
         logger.info("Updated phone verification for member %s: %s", member_id, phone_verified)
     
@@ -194,35 +249,57 @@ def update_member_verification_status(member_id: str, phone_verified: bool = Non
         member_record["kyc_status"] = kyc_status
         logger.info("Updated KYC status for member %s: %s", member_id, kyc_status)
     
+    # Keep the group's verified/pending counters in step
+    new_bucket = _member_bucket(member_record)
+    if new_bucket != old_bucket:
+        counters = _GROUP_COUNTERS[member_record["group_id"]]
+        if old_bucket:
+            counters[old_bucket] -= 1
+        if new_bucket:
+            counters[new_bucket] += 1
+    
     # Update last active
-    member_record["last_active"] = datetime.utcnow()
+    member_record["last_active"] = datetime.now(timezone.utc)
     
-    return MemberOut(**member_record)
+    return _store_member_out(member_record)
+
+
+def get_total_member_count() -> int:
+    """Get the number of registered members."""
+    return len(_MEMBERS)
 
 
+def get_verified_phone_count() -> int:
+    """Get the number of members with a verified phone."""
+    return _VERIFIED_PHONE_COUNT
+
+
+@ttl_cached("groups:all")
 def get_all_groups() -> List[GroupOut]:
     """Get all groups."""
-    return [GroupOut(**group_record) for group_record in _GROUPS.values()]
+    return list(_GROUP_OUT.values())
 
 
 def update_group_treasury(group_id: str, treasury_address: str) -> Optional[GroupOut]:
     """Update group treasury address after Safe deployment."""
-    if group_id not in _GROUPS:
+    group_record = _GROUPS.get(group_id)
+    if not group_record:
         return None
     
-    _GROUPS[group_id]["treasury_address"] = treasury_address
+    group_record["treasury_address"] = treasury_address
+    invalidate("groups:all")
     logger.info("Updated treasury address for group %s: %s", group_id, treasury_address)
     
-    return GroupOut(**_GROUPS[group_id])
+    return _store_group_out(group_record)
 
 
 def get_member_group_info(member_id: str) -> Optional[GroupMembershipOut]:
     """Get member's group membership information."""
-    member = get_member_by_id(member_id)
+    member = _MEMBER_OUT.get(member_id)
     if not member:
         return None
     
-    group = get_group_by_id(member.group_id)
+    group = _GROUP_OUT.get(member.group_id)
     if not group:
         return None
     
@@ -4,6 +4,7 @@ from app.models.schemas import VoteIn, VoteOut
 
 # naive in-memory store for demo/tests
 _VOTES: Dict[str, Dict[str, bool]] = defaultdict(dict)
+_MEMBER_VOTES: Dict[str, Dict[str, bool]] = defaultdict(dict)  # member_id -> {proposal_id: vote}
 
 
 def record_vote(v: VoteIn) -> VoteOut:
@@ -12,10 +13,15 @@ def record_vote(v: VoteIn) -> VoteOut:
         raise ValueError(f"Member {v.memberId} already voted on proposal {v.proposalId}")
 
     _VOTES[v.proposalId][v.memberId] = v.vote
+    _MEMBER_VOTES[v.memberId][v.proposalId] = v.vote
     tally = get_vote_tally(v.proposalId)
     return VoteOut(**{"memberId": v.memberId, "proposalId": v.proposalId, "vote": v.vote, "tally": tally})
 
 
+def get_member_votes(member_id: str) -> Dict[str, bool]:
+    return _MEMBER_VOTES.get(member_id, {})
+
+
 def get_vote_tally(proposal_id: str):
     votes = _VOTES.get(proposal_id, {})
     yes = sum(1 for _, val in votes.items() if val)
@@ -0,0 +1,39 @@
+import time
+from functools import wraps
+from typing import Any, Callable, Dict, Tuple
+
+# In-process cache for read-heavy, eventually-consistent results
+# (replace with Redis SETEX/DEL to share across workers)
+_CACHE: Dict[str, Dict[tuple, Tuple[float, Any]]] = {}  # key -> {call arguments -> (expires_at, value)}
+_MAX_ENTRIES_PER_KEY = 256  # distinct argument combinations kept per key before starting over
+
+
+def ttl_cached(key: str, ttl: float = 5.0) -> Callable:
+    """Cache the results of a function under `key` for `ttl` seconds, per call arguments."""
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            now = time.monotonic()
+            call_key = (args, tuple(sorted(kwargs.items())))
+            entries = _CACHE.setdefault(key, {})
+            entry = entries.get(call_key)
+            if entry and entry[0] > now:
+                return entry[1]
+            value = func(*args, **kwargs)
+            if len(entries) >= _MAX_ENTRIES_PER_KEY:
+                entries.clear()
+            entries[call_key] = (now + ttl, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidate(*keys: str) -> None:
+    """Drop cached results so the next call recomputes them."""
+    for key in keys:
+        _CACHE.pop(key, None)
+
+
+def clear() -> None:
+    """Drop every cached result."""
+    _CACHE.clear()
@@ -1,11 +1,99 @@
+import asyncio
+import base64
+import importlib.util
 import logging
+import re
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from typing import Optional
+
+import httpx
+import orjson
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
 
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# E.164 without the leading '+': country code then up to 15 digits total
+_E164_DIGITS_RE = re.compile(r'[1-9]\d{1,14}')
+# Same rule applied line-by-line, for validating many numbers in one scan
+_E164_LINE_RE = re.compile(r'^\+[1-9]\d{1,14}$', re.M)
+# Deletes every ASCII character other than digits and '+'
+_KEEP_DIGITS_PLUS = str.maketrans('', '', ''.join(chr(i) for i in range(128) if not (chr(i).isdigit() or chr(i) == '+')))
+
+# Bound once at import; read on every outbound SMS
+_TWILIO_FROM = settings.TWILIO_PHONE_NUMBER
+# Let Twilio pick a sender from the Messaging Service pool when one is configured
+_TWILIO_SENDER = (
+    {"MessagingServiceSid": settings.TWILIO_MESSAGING_SERVICE_SID}
+    if settings.TWILIO_MESSAGING_SERVICE_SID else {"From": _TWILIO_FROM} if _TWILIO_FROM else {}
+)
+
+# Twilio endpoints and credentials are fixed for the process, so build them once
+_TWILIO_MESSAGES_URL = f"https://api.twilio.com/2010-04-01/Accounts/{settings.TWILIO_ACCOUNT_SID}/Messages.json"
+_TWILIO_STATUS_URL_TMPL = f"https://api.twilio.com/2010-04-01/Accounts/{settings.TWILIO_ACCOUNT_SID}/Messages/{{}}.json"
+
+
+def _basic_auth_headers(account_sid: Optional[str], auth_token: Optional[str]) -> dict:
+    """Build the HTTP Basic auth header for Twilio, or no headers without credentials."""
+    if not account_sid or not auth_token:
+        return {}
+    return {"Authorization": "Basic " + base64.b64encode(f"{account_sid}:{auth_token}".encode()).decode()}
+
+
+_TWILIO_AUTH_HEADERS = _basic_auth_headers(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+
+_NOTIFY_MAX_BINDINGS = 10_000  # Twilio Notify limit per request
+
+_BULK_MAX_WORKERS = 32
+
+# Shared session so sync sends reuse TCP/TLS connections to Twilio
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=_BULK_MAX_WORKERS, pool_maxsize=_BULK_MAX_WORKERS))
+_SESSION.headers.update(_TWILIO_AUTH_HEADERS)
+
+# Single sends go straight to a urllib3 pool, skipping the requests wrapper;
+# the session path stays available behind SMS_FAST_PATH while migrating
+_SMS_FAST_PATH = settings.SMS_FAST_PATH
+_POOL = urllib3.PoolManager(maxsize=_BULK_MAX_WORKERS, retries=urllib3.Retry(total=1))
+_POOL_HEADERS = {**_TWILIO_AUTH_HEADERS, "Content-Type": "application/x-www-form-urlencoded"}
+
+# Shared async client so concurrent sends reuse kept-alive connections to Twilio
+_ASYNC_CLIENT: Optional[httpx.AsyncClient] = None
+_ASYNC_MAX_CONNECTIONS = 100
+# HTTP/2 multiplexes concurrent sends over one connection; needs the httpx[http2] extra
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+def _new_async_client() -> httpx.AsyncClient:
+    """Create an async HTTP client configured for Twilio."""
+    return httpx.AsyncClient(
+        http2=_HTTP2,
+        limits=httpx.Limits(max_connections=_ASYNC_MAX_CONNECTIONS, max_keepalive_connections=50),
+        headers=_TWILIO_AUTH_HEADERS,
+        timeout=10
+    )
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client, creating it on first use."""
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is None or _ASYNC_CLIENT.is_closed:
+        _ASYNC_CLIENT = _new_async_client()
+    return _ASYNC_CLIENT
+
+
+async def close_async_client() -> None:
+    """Close the shared async HTTP client (called on app shutdown)."""
+    global _ASYNC_CLIENT
+    if _ASYNC_CLIENT is not None:
+        await _ASYNC_CLIENT.aclose()
+        _ASYNC_CLIENT = None
+
 
 def send_sms(to_phone: str, message: str) -> bool:
     """
@@ -25,34 +113,77 @@ def send_sms(to_phone: str, message: str) -> bool:
         return True  # Return True for development/testing
     
     try:
-        # Twilio API endpoint
-        url = f"https://api.twilio.com/2010-04-01/Accounts/{settings.TWILIO_ACCOUNT_SID}/Messages.json"
-        
         # Request payload
         data = {
-            "From": settings.TWILIO_PHONE_NUMBER,
+            **_TWILIO_SENDER,
             "To": to_phone,
             "Body": message
         }
         
-        # Make request with basic auth
-        response = requests.post(
-            url,
-            data=data,
-            auth=(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN),
-            timeout=10
-        )
+        if _SMS_FAST_PATH:
+            response = _POOL.request(
+                "POST", _TWILIO_MESSAGES_URL,
+                body=urllib.parse.urlencode(data).encode(), headers=_POOL_HEADERS, timeout=10.0
+            )
+            status_code, content = response.status, response.data
+        else:
+            # Basic auth header is preset on the session
+            response = _SESSION.post(_TWILIO_MESSAGES_URL, data=data, timeout=10)
+            status_code, content = response.status_code, response.content
         
-        if response.status_code == 201:
-            response_data = response.json()
+        if status_code == 201:
+            response_data = orjson.loads(content)
             message_sid = response_data.get("sid")
             logger.info("SMS sent successfully to %s, SID: %s", to_phone, message_sid)
             return True
+        else:
+            logger.error("Failed to send SMS to %s: %s %s", to_phone, status_code,
+                         content.decode(errors="replace"))
+            return False
+            
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+        logger.error("Network error sending SMS to %s: %s", to_phone, e)
+        return False
+    except Exception as e:
+        logger.error("Unexpected error sending SMS to %s: %s", to_phone, e)
+        return False
+
+
+async def send_sms_async(to_phone: str, message: str, client: Optional[httpx.AsyncClient] = None) -> bool:
+    """
+    Send SMS using Twilio API without blocking the event loop.
+    
+    Args:
+        to_phone: Recipient phone number in E.164 format
+        message: SMS message content
+        client: Async client to send with (defaults to the shared client)
+        
+    Returns:
+        bool: True if SMS sent successfully, False otherwise
+    """
+    if not settings.TWILIO_ACCOUNT_SID or not settings.TWILIO_AUTH_TOKEN:
+        logger.warning("Twilio credentials not configured, simulating SMS send")
+        logger.info("SIMULATED SMS to %s: %s", to_phone, message)
+        return True  # Return True for development/testing
+    
+    try:
+        data = {
+            **_TWILIO_SENDER,
+            "To": to_phone,
+            "Body": message
+        }
+        
+        response = await (client or _get_async_client()).post(_TWILIO_MESSAGES_URL, data=data)
+        
+        if response.status_code == 201:
+            message_sid = orjson.loads(response.content).get("sid")
+            logger.info("SMS sent successfully to %s, SID: %s", to_phone, message_sid)
+            return True
         else:
             logger.error("Failed to send SMS to %s: %s %s", to_phone, response.status_code, response.text)
             return False
             
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error("Network error sending SMS to %s: %s", to_phone, e)
         return False
     except Exception as e:
@@ -78,8 +209,93 @@ def send_bulk_sms(phone_numbers: list, message: str) -> dict:
         "failed_numbers": []
     }
     
-    for phone in phone_numbers:
-        if send_sms(phone, message):
+    phone_numbers = _drop_invalid_numbers(results, phone_numbers)
+    if not phone_numbers:
+        return results
+    
+    # One Notify request per batch instead of one Messages request per number
+    if settings.TWILIO_NOTIFY_SERVICE_SID and settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN:
+        accepted = send_bulk_sms_notify(phone_numbers, message)
+        results["sent"] = accepted
+        phone_numbers = phone_numbers[accepted:]
+        if not phone_numbers:
+            logger.info("Bulk SMS handed to Twilio Notify for %d recipients", results["total"])
+            return results
+        logger.warning("Twilio Notify bulk send failed, falling back to per-number sends for %d recipients",
+                       len(phone_numbers))
+    
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # No loop in this thread: multiplex the sends on a short-lived event loop
+        outcomes = asyncio.run(_send_many_async(phone_numbers, message))
+    else:
+        # Called synchronously from inside a running loop; fall back to threads
+        with ThreadPoolExecutor(max_workers=min(_BULK_MAX_WORKERS, len(phone_numbers))) as executor:
+            outcomes = list(executor.map(send_sms, phone_numbers, repeat(message)))
+    
+    return _tally_bulk_results(results, phone_numbers, outcomes)
+
+
+async def send_bulk_sms_async(phone_numbers: list, message: str) -> dict:
+    """
+    Send SMS to multiple recipients concurrently on the running event loop.
+    
+    Args:
+        phone_numbers: List of phone numbers in E.164 format
+        message: SMS message content
+        
+    Returns:
+        dict: Summary of send results
+    """
+    results = {
+        "total": len(phone_numbers),
+        "sent": 0,
+        "failed": 0,
+        "failed_numbers": []
+    }
+    phone_numbers = _drop_invalid_numbers(results, phone_numbers)
+    outcomes = await _gather_sends(_get_async_client(), phone_numbers, message)
+    return _tally_bulk_results(results, phone_numbers, outcomes)
+
+
+async def _send_many_async(phone_numbers: list, message: str) -> list:
+    """Send on a dedicated client bound to the current (short-lived) event loop."""
+    async with _new_async_client() as client:
+        return await _gather_sends(client, phone_numbers, message)
+
+
+async def _gather_sends(client: httpx.AsyncClient, phone_numbers: list, message: str) -> list:
+    """Send one SMS per number concurrently, capped at the client's connection limit."""
+    semaphore = asyncio.Semaphore(_ASYNC_MAX_CONNECTIONS)
+    
+    async def send(phone: str) -> bool:
+        async with semaphore:
+            return await send_sms_async(phone, message, client)
+    
+    return await asyncio.gather(*(send(phone) for phone in phone_numbers))
+
+
+def _drop_invalid_numbers(results: dict, phone_numbers: list) -> list:
+    """Record malformed numbers as failed up front and return the ones worth sending to."""
+    valid_numbers = []
+    for phone, valid in zip(phone_numbers, validate_phone_numbers_bulk(phone_numbers)):
+        if valid:
+            valid_numbers.append(phone)
+        else:
+            results["failed"] += 1
+            results["failed_numbers"].append(phone)
+    
+    if results["failed"]:
+        logger.warning("Skipping %d invalid phone numbers in bulk SMS", results["failed"])
+    
+    return valid_numbers
+
+
+def _tally_bulk_results(results: dict, phone_numbers: list, outcomes: list) -> dict:
+    """Fold per-number send outcomes into a bulk results summary."""
+    for phone, sent in zip(phone_numbers, outcomes):
+        if sent:
             results["sent"] += 1
         else:
             results["failed"] += 1
@@ -91,6 +307,39 @@ def send_bulk_sms(phone_numbers: list, message: str) -> dict:
     return results
 
 
+def send_bulk_sms_notify(phone_numbers: list, message: str) -> int:
+    """
+    Send one SMS to many recipients through the Twilio Notify API.
+    
+    Args:
+        phone_numbers: List of phone numbers in E.164 format
+        message: SMS message content
+        
+    Returns:
+        int: Number of leading recipients accepted; batches stop at the first failure
+    """
+    url = f"https://notify.twilio.com/v1/Services/{settings.TWILIO_NOTIFY_SERVICE_SID}/Notifications"
+    
+    accepted = 0
+    try:
+        for start in range(0, len(phone_numbers), _NOTIFY_MAX_BINDINGS):
+            batch = phone_numbers[start:start + _NOTIFY_MAX_BINDINGS]
+            data = [("Body", message)] + [
+                ("ToBinding", orjson.dumps({"binding_type": "sms", "address": phone}).decode())
+                for phone in batch
+            ]
+            response = _SESSION.post(url, data=data, timeout=10)
+            if response.status_code != 201:
+                logger.error("Failed to send Notify batch: %s %s", response.status_code, response.text)
+                break
+            accepted += len(batch)
+    
+    except requests.exceptions.RequestException as e:
+        logger.error("Network error sending Notify batch: %s", e)
+    
+    return accepted
+
+
 def validate_phone_number(phone_number: str) -> bool:
     """
     Validate phone number format (E.164).
@@ -101,11 +350,24 @@ def validate_phone_number(phone_number: str) -> bool:
     Returns:
         bool: True if valid E.164 format
     """
-    import re
-    
     # E.164 format: +[country code][number] (max 15 digits total)
-    pattern = r'^\+[1-9]\d{1,14}$'
-    return bool(re.match(pattern, phone_number))
+    return phone_number.startswith('+') and _E164_DIGITS_RE.fullmatch(phone_number, 1) is not None
+
+
+def validate_phone_numbers_bulk(phone_numbers: list) -> list:
+    """
+    Validate many phone numbers (E.164) with a single regex scan.
+    
+    Args:
+        phone_numbers: Phone numbers to validate
+        
+    Returns:
+        list: One bool per input number, True if valid E.164 format
+    """
+    # Every matched line is a valid number, and a number containing a newline can
+    # never equal a single matched line, so set membership answers each input
+    matched = set(_E164_LINE_RE.findall('\n'.join(phone_numbers)))
+    return [phone in matched for phone in phone_numbers]
 
 
 def format_phone_number(phone_number: str, default_country_code: str = "+254") -> Optional[str]:
@@ -120,7 +382,10 @@ def format_phone_number(phone_number: str, default_country_code: str = "+254") -
         str: Formatted phone number or None if invalid
     """
     # Remove all non-digit characters except +
-    cleaned = ''.join(c for c in phone_number if c.isdigit() or c == '+')
+    if phone_number.isascii():
+        cleaned = phone_number.translate(_KEEP_DIGITS_PLUS)
+    else:
+        cleaned = ''.join(c for c in phone_number if c.isdigit() or c == '+')
     
     # If already starts with +, validate and return
     if cleaned.startswith('+'):
@@ -158,16 +423,10 @@ def get_sms_delivery_status(message_sid: str) -> Optional[dict]:
         return None
     
     try:
-        url = f"https://api.twilio.com/2010-04-01/Accounts/{settings.TWILIO_ACCOUNT_SID}/Messages/{message_sid}.json"
-        
-        response = requests.get(
-            url,
-            auth=(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN),
-            timeout=10
-        )
+        response = _SESSION.get(_TWILIO_STATUS_URL_TMPL.format(message_sid), timeout=10)
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             return {
                 "sid": data.get("sid"),
                 "status": data.get("status"),
@@ -187,6 +446,13 @@ def get_sms_delivery_status(message_sid: str) -> Optional[dict]:
         return None
 
 
+def _truncate(text: str, limit: int) -> str:
+    """Cut text to limit characters, marking the cut with '...'; short text is returned as-is."""
+    if len(text) <= limit:
+        return text
+    return text[:limit] + "..."
+
+
 def send_otp_sms(phone_number: str, otp_code: str, expiry_minutes: int = 10) -> bool:
     """
     Send OTP verification SMS.
@@ -223,7 +489,7 @@ def send_vote_confirmation_sms(phone_number: str, proposal_title: str, vote: str
     """
     message = (
         f"✅ Vote recorded: {vote}\n"
-        f"Proposal: {proposal_title[:50]}{'...' if len(proposal_title) > 50 else ''}\n"
+        f"Proposal: {_truncate(proposal_title, 50)}\n"
         f"Current tally: {tally.get('yes', 0)} YES, {tally.get('no', 0)} NO"
     )
     
@@ -245,7 +511,7 @@ def send_proposal_notification_sms(phone_number: str, proposal_title: str, short
     """
     message = (
         f"🗳️ HARAMBEE DAO VOTE\n"
-        f"Proposal: {proposal_title[:60]}{'...' if len(proposal_title) > 60 else ''}\n"
+        f"Proposal: {_truncate(proposal_title, 60)}\n"
         f"Vote by {deadline}\n"
         f"Reply: YES{short_code} or NO{short_code}"
     )
@@ -4,9 +4,9 @@ Harambee DAO Backend - Deployment Readiness Check
 This script verifies that all deployment requirements are met.
 """
 
+import ast
 import os
 import sys
-import subprocess
 import requests
 from pathlib import Path
 
@@ -53,16 +53,12 @@ def check_python_syntax() -> bool:
     for file_path in python_files:
         if check_file_exists(file_path):
             try:
-                result = subprocess.run(
-                    [sys.executable, "-m", "py_compile", file_path],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0:
-                    print(f"  ✅ {file_path}")
-                else:
-                    print(f"  ❌ {file_path} - Syntax Error: {result.stderr}")
-                    all_valid = False
+                with open(file_path, "rb") as f:
+                    ast.parse(f.read(), filename=file_path)
+                print(f"  ✅ {file_path}")
+            except SyntaxError as e:
+                print(f"  ❌ {file_path} - Syntax Error: line {e.lineno}: {e.msg}")
+                all_valid = False
             except Exception as e:
                 print(f"  ❌ {file_path} - Error: {e}")
                 all_valid = False
@@ -93,9 +89,16 @@ def check_environment_template() -> bool:
     with open(".env.example", "r") as f:
         env_content = f.read()
     
+    # Only names declared before '=' count; a name inside a value or comment does not
+    declared = {
+        line.split("=", 1)[0].strip()
+        for line in env_content.splitlines()
+        if "=" in line and not line.lstrip().startswith("#")
+    }
+    
     all_present = True
     for var in required_vars:
-        if var in env_content:
+        if var in declared:
             print(f"  ✅ {var}")
         else:
             print(f"  ❌ {var} - Missing from .env.example")
@@ -184,7 +187,7 @@ def generate_deployment_summary():
     print("  2. Connect GitHub repository: Harambee-Dao-Backend")
     print("  3. Configure build settings:")
     print("     - Build Command: pip install -e .")
-    print("     - Start Command: uvicorn app.main:app --host 0.0.0.0 --port $PORT")
+    print("     - Start Command: uvicorn app.main:app --host 0.0.0.0 --port $PORT --loop uvloop --http httptools")
     print("  4. Add environment variables from .env.example")
     print("  5. Deploy and test endpoints")
     
@@ -6,15 +6,38 @@ Usage: python scripts/health_check.py [URL]
 
 import sys
 import requests
-import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from itertools import repeat
+
+try:
+    import orjson
+
+    def _loads(text: str):
+        return orjson.loads(text)
+
+    def _dumps_indented(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:  # orjson is optional for this standalone script
+    import json
+
+    def _loads(text: str):
+        return json.loads(text)
+
+    def _dumps_indented(obj) -> str:
+        return json.dumps(obj, indent=2)
+
+# Shared session so all probes reuse one keep-alive connection to the host
+_SESSION = requests.Session()
 
 def check_endpoint(url: str, endpoint: str, expected_status: int = 200) -> dict:
     """Check a specific endpoint and return results."""
     full_url = f"{url.rstrip('/')}/{endpoint.lstrip('/')}"
     
     try:
-        response = requests.get(full_url, timeout=10)
+        # Stream so only the 200-byte preview is read, not e.g. the whole OpenAPI schema
+        with _SESSION.get(full_url, timeout=10, stream=True) as response:
+            content = response.raw.read(200, decode_content=True).decode("utf-8", "replace")
         
         return {
             "endpoint": endpoint,
@@ -22,7 +45,7 @@ def check_endpoint(url: str, endpoint: str, expected_status: int = 200) -> dict:
             "status_code": response.status_code,
             "success": response.status_code == expected_status,
             "response_time": response.elapsed.total_seconds(),
-            "content": response.text[:200] if response.text else None
+            "content": content or None
         }
     except requests.exceptions.RequestException as e:
         return {
@@ -55,21 +78,22 @@ def main():
         ("openapi", "/openapi.json")
     ]
     
-    results = []
     all_healthy = True
     
-    for name, endpoint in endpoints:
+    # Probe all endpoints concurrently; map keeps results in submission order
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as executor:
+        results = list(executor.map(check_endpoint, repeat(base_url), [endpoint for _, endpoint in endpoints]))
+    
+    for (name, _), result in zip(endpoints, results):
         print(f"\n🔍 Checking {name}...")
-        result = check_endpoint(base_url, endpoint)
-        results.append(result)
         
         if result["success"]:
             print(f"  ✅ {result['status_code']} - {result['response_time']:.2f}s")
             if result.get("content"):
                 try:
                     # Try to parse JSON response
-                    json_content = json.loads(result["content"])
-                    print(f"  📄 Response: {json.dumps(json_content, indent=2)[:100]}...")
+                    json_content = _loads(result["content"])
+                    print(f"  📄 Response: {_dumps_indented(json_content)[:100]}...")
                 except:
                     print(f"  📄 Response: {result['content'][:100]}...")
         else:
@@ -12,11 +12,15 @@ setup(
         "pydantic-settings>=2.4.0",
         "python-dotenv>=1.0.1",
         "requests>=2.32.0",
+        "urllib3>=1.26.0",
+        "httpx[http2]>=0.27.0",
+        "orjson>=3.10.0",
     ],
     extras_require={
         "dev": [
             "pytest>=8.0.0",
             "pytest-cov>=5.0.0",
+            "pytest-xdist>=3.5.0",
             "httpx>=0.27.0",
             "ruff>=0.5.5",
             "mypy>=1.10.0",
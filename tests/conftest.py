@@ -0,0 +1,164 @@
+import copy
+import itertools
+import os
+from collections import deque
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.schemas import KYCDocumentType, MemberRole
+from app.services import (
+    kyc_service, phone_verification_service, proposal_service, sms_service, user_service, vote_service
+)
+from app.utils import cache
+
+# Modules whose underscore-prefixed module globals are the in-memory stores
+_STATEFUL_MODULES = (
+    kyc_service, phone_verification_service, proposal_service, sms_service, user_service, vote_service
+)
+
+
+# Each xdist worker (gw0, gw1, ...) draws from its own block of ten million numbers
+_PHONE_SEQ = itertools.count(
+    int(os.environ.get("PYTEST_XDIST_WORKER", "gw0")[2:]) * 10_000_000 + 700_000_000
+)
+
+
+def _unique_phone() -> str:
+    """Return a phone number no other test in this session has used."""
+    return f"+254{next(_PHONE_SEQ):09d}"
+
+
+def _snapshot_stores() -> dict:
+    """Deep-copy every in-memory store (and store counter) of the service modules."""
+    state = {
+        (module, name): value
+        for module in _STATEFUL_MODULES
+        for name, value in vars(module).items()
+        if name.startswith("_") and (isinstance(value, (dict, list, set, deque)) or type(value) is int)
+    }
+    # One deepcopy call so records shared between stores stay shared
+    return dict(zip(state, copy.deepcopy(list(state.values()))))
+
+
+def _restore_stores(snapshot: dict) -> None:
+    """Put the stores back in place, keeping the container objects other modules hold."""
+    for (module, name), value in snapshot.items():
+        live = getattr(module, name)
+        if isinstance(live, dict):
+            live.clear()
+            live.update(value)
+        elif isinstance(live, list):
+            live[:] = value
+        elif isinstance(live, set):
+            live.clear()
+            live.update(value)
+        elif isinstance(live, deque):
+            live.clear()
+            live.extend(value)
+        else:
+            setattr(module, name, value)
+
+
+@pytest.fixture(autouse=True)
+def _isolate_stores():
+    """Undo each test's writes to the in-memory stores once it finishes.
+    
+    State created by class- or session-scoped fixtures predates the snapshot
+    and so survives; only what the test itself changed is rolled back.
+    """
+    snapshot = _snapshot_stores()
+    yield
+    _restore_stores(snapshot)
+
+
+@pytest.fixture(autouse=True)
+def _clear_result_cache():
+    """Start every test with empty TTL caches so no test reads another's stale results."""
+    cache.clear()
+
+
+@pytest.fixture
+def unique_phone():
+    """Factory for phone numbers no other test in this session has used."""
+    return _unique_phone
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient for the whole session, with the app lifespan entered once."""
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="class")
+def member_group(client):
+    """Create one group per test class and return its ID."""
+    response = client.post("/api/users/groups", json={
+        "group_name": "Member Test Group",
+        "location": "Mombasa, Kenya",
+        "leader_phone": _unique_phone(),
+        "leader_name": "Leader Test",
+        "expected_member_count": 5,
+        "treasury_threshold": 2
+    })
+    assert response.status_code == 201
+    return orjson.loads(response.content)["group_id"]
+
+
+@pytest.fixture(scope="class")
+def kyc_member(client, member_group):
+    """Register one member per test class and return (group_id, member_id)."""
+    response = client.post("/api/users/members", json={
+        "phone_number": _unique_phone(),
+        "full_name": "KYC Test Member",
+        "group_id": member_group,
+        "role": MemberRole.MEMBER.value
+    })
+    assert response.status_code == 201
+    return member_group, orjson.loads(response.content)["member_id"]
+
+
+@pytest.fixture
+def created_group(client):
+    """Create a fresh group and return its response body."""
+    response = client.post("/api/users/groups", json={
+        "group_name": "Created Test Group",
+        "location": "Nairobi, Kenya",
+        "leader_phone": _unique_phone(),
+        "leader_name": "Group Leader",
+        "expected_member_count": 5,
+        "treasury_threshold": 2
+    })
+    assert response.status_code == 201
+    return orjson.loads(response.content)
+
+
+@pytest.fixture
+def registered_member(client, member_group):
+    """Register a fresh member into the class group and return its response body."""
+    response = client.post("/api/users/members", json={
+        "phone_number": _unique_phone(),
+        "full_name": "Registered Member",
+        "group_id": member_group,
+        "location": "Mombasa, Kenya",
+        "role": MemberRole.MEMBER.value
+    })
+    assert response.status_code == 201
+    return orjson.loads(response.content)
+
+
+@pytest.fixture(scope="class")
+def kyc_document(client, kyc_member):
+    """Submit one KYC document for the class member and return its response body."""
+    _, member_id = kyc_member
+    response = client.post("/api/users/kyc/documents", json={
+        "member_id": member_id,
+        "document_type": KYCDocumentType.NATIONAL_ID.value,
+        "document_number": "12345678",
+        "issuing_authority": "Government of Kenya"
+    })
+    assert response.status_code == 201
+    return orjson.loads(response.content)
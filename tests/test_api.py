@@ -1,17 +1,13 @@
-from fastapi.testclient import TestClient
-from app.main import app
 from app.models.schemas import AuditDecision
 
-client = TestClient(app)
 
-
-def test_ping():
+def test_ping(client):
     r = client.get("/api/ping")
     assert r.status_code == 200
     assert r.json()["message"] == "pong"
 
 
-def test_vote_and_tally():
+def test_vote_and_tally(client):
     # vote yes
     r1 = client.post("/api/vote", json={"memberId": "m1", "proposalId": "p1", "vote": True})
     assert r1.status_code == 200
@@ -28,7 +24,7 @@ def test_vote_and_tally():
     assert data["total"] == 2
 
 
-def test_audit_result():
+def test_audit_result(client):
     payload = {
         "proposalId": "p2",
         "decision": AuditDecision.PASS.value,
@@ -45,7 +41,7 @@ def test_audit_result():
     assert data["attestationValid"] is True
 
 
-def test_audit_result_attestation_invalid():
+def test_audit_result_attestation_invalid(client):
     # empty signature ensures verify_attestation returns False
     payload = {
         "proposalId": "p3",
@@ -63,7 +59,7 @@ def test_audit_result_attestation_invalid():
     assert data["attestationValid"] is False
 
 
-def test_testall_smoke():
+def test_testall_smoke(client):
     r = client.get("/api/testall")
     assert r.status_code == 200
     data = r.json()
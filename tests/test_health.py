@@ -1,9 +1,4 @@
-from fastapi.testclient import TestClient
-from app.main import app
-
-
-def test_health():
-    client = TestClient(app)
+def test_health(client):
     r = client.get("/health")
     assert r.status_code == 200
     data = r.json()
@@ -11,3 +11,20 @@ def test_setup_logging_idempotent():
     setup_logging()  # sets handler/formatter/level
     # Second call should early-return, covering that branch
     setup_logging()
+
+
+def test_setup_logging_replaces_listener():
+    from app.core import logging as app_logging
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    setup_logging()
+    first = app_logging._LISTENER
+
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    setup_logging()
+
+    assert app_logging._LISTENER is not first
+    assert first._thread is None  # stopped, not left running
@@ -1,23 +1,54 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import orjson
 import pytest
-from fastapi.testclient import TestClient
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.models.params import PaginationParams
+from app.models.schemas import (
+    KYCDocumentIn, KYCDocumentType, KYCReviewIn, KYCStatus, MemberIn, MemberRole, OTPRequestIn, ProposalIn,
+    VerificationStatus
+)
+from app.services import phone_verification_service as pvs
+from app.services import kyc_service, proposal_service, sms_service, user_service, vote_service
 
-from app.main import app
-from app.models.schemas import KYCStatus, MemberRole, KYCDocumentType
+# Plain string values, bound once for request bodies and assertions
+_PENDING = KYCStatus.PENDING.value
+_VERIFIED = KYCStatus.VERIFIED.value
+_MEMBER = MemberRole.MEMBER.value
+_NATIONAL_ID = KYCDocumentType.NATIONAL_ID.value
 
-client = TestClient(app)
+
+def _j(response):
+    """Decode a response body with orjson instead of httpx's json module."""
+    return orjson.loads(response.content)
+
+
+def _recount_kyc():
+    """Rebuild the KYC statistics and pending queue by scanning every stored document."""
+    first_doc_at = {}
+    for record in kyc_service._KYC_DOCUMENTS.values():
+        member_id = record["member_id"]
+        first_doc_at[member_id] = min(first_doc_at.get(member_id, record["created_at"]), record["created_at"])
+    
+    statuses = {member_id: user_service.get_member_by_id(member_id).kyc_status for member_id in first_doc_at}
+    counts = {kyc_status: list(statuses.values()).count(kyc_status) for kyc_status in KYCStatus}
+    pending = sorted((m for m, kyc_status in statuses.items() if kyc_status == KYCStatus.PENDING), key=first_doc_at.get)
+    return counts, pending, len(first_doc_at)
 
 
 class TestGroupManagement:
     """Test group creation and management."""
     
-    def test_create_group(self):
+    def test_create_group(self, client, unique_phone):
         """Test creating a new group."""
         group_data = {
             "group_name": "Test Farmers Group",
             "description": "A test farming community",
             "location": "Nairobi, Kenya",
-            "leader_phone": "+254700000001",
+            "leader_phone": unique_phone(),
             "leader_name": "John Doe",
             "expected_member_count": 10,
             "treasury_threshold": 3
@@ -26,38 +57,51 @@ class TestGroupManagement:
         response = client.post("/api/users/groups", json=group_data)
         assert response.status_code == 201
         
-        data = response.json()
+        data = _j(response)
         assert data["group_name"] == group_data["group_name"]
         assert data["location"] == group_data["location"]
         assert data["member_count"] == 1  # Leader is automatically added
-        assert data["kyc_status"] == KYCStatus.PENDING
-        
-        return data["group_id"]
+        assert data["kyc_status"] == _PENDING
     
-    def test_list_groups(self):
+    def test_list_groups(self, client):
         """Test listing all groups."""
         response = client.get("/api/users/groups")
         assert response.status_code == 200
         
-        groups = response.json()
+        groups = _j(response)
         assert isinstance(groups, list)
     
-    def test_get_group_by_id(self):
+    def test_get_group_by_id(self, client, created_group):
         """Test getting a specific group."""
-        group_id = self.test_create_group()
+        group_id = created_group["group_id"]
         
         response = client.get(f"/api/users/groups/{group_id}")
         assert response.status_code == 200
         
-        data = response.json()
+        data = _j(response)
         assert data["group_id"] == group_id
     
-    def test_create_group_duplicate_phone(self):
+    def test_create_group_invalid_leader_name_leaves_no_group(self, client, unique_phone):
+        """Test that a leader rejected by member validation does not leave an orphan group."""
+        group_count = len(user_service._GROUPS)
+        
+        response = client.post("/api/users/groups", json={
+            "group_name": "Orphan Test Group",
+            "location": "Nairobi, Kenya",
+            "leader_phone": unique_phone(),
+            "leader_name": "J0hn",
+            "expected_member_count": 5,
+            "treasury_threshold": 2
+        })
+        assert response.status_code == 400
+        assert len(user_service._GROUPS) == group_count
+    
+    def test_create_group_duplicate_phone(self, client, unique_phone):
         """Test creating group with duplicate leader phone."""
         group_data = {
             "group_name": "Test Group 1",
             "location": "Nairobi, Kenya",
-            "leader_phone": "+254700000002",
+            "leader_phone": unique_phone(),
             "leader_name": "Jane Doe",
             "expected_member_count": 5,
             "treasury_threshold": 2
@@ -73,205 +117,383 @@ class TestGroupManagement:
         assert response2.status_code == 400
 
 
+@pytest.mark.xdist_group("user_mgmt_members")
 class TestMemberManagement:
     """Test member registration and management."""
     
-    def setup_method(self):
-        """Set up test group for member tests."""
-        group_data = {
-            "group_name": "Member Test Group",
-            "location": "Mombasa, Kenya",
-            "leader_phone": "+254700000003",
-            "leader_name": "Leader Test",
-            "expected_member_count": 5,
-            "treasury_threshold": 2
-        }
-        
-        response = client.post("/api/users/groups", json=group_data)
-        self.group_id = response.json()["group_id"]
-    
-    def test_register_member(self):
+    def test_register_member(self, client, member_group, unique_phone):
         """Test registering a new member."""
         member_data = {
-            "phone_number": "+254700000004",
+            "phone_number": unique_phone(),
             "full_name": "Test Member",
-            "group_id": self.group_id,
+            "group_id": member_group,
             "location": "Mombasa, Kenya",
-            "role": MemberRole.MEMBER
+            "role": _MEMBER
         }
         
         response = client.post("/api/users/members", json=member_data)
         assert response.status_code == 201
         
-        data = response.json()
+        data = _j(response)
         assert data["phone_number"] == member_data["phone_number"]
         assert data["full_name"] == member_data["full_name"]
-        assert data["group_id"] == self.group_id
+        assert data["group_id"] == member_group
         assert data["phone_verified"] == False
-        assert data["kyc_status"] == KYCStatus.PENDING
-        
-        return data["member_id"]
+        assert data["kyc_status"] == _PENDING
     
-    def test_get_member_by_phone(self):
+    def test_get_member_by_phone(self, client, registered_member):
         """Test getting member by phone number."""
-        member_id = self.test_register_member()
-        
-        response = client.get("/api/users/members/phone/+254700000004")
+        response = client.get(f"/api/users/members/phone/{registered_member['phone_number']}")
         assert response.status_code == 200
         
-        data = response.json()
-        assert data["member_id"] == member_id
+        data = _j(response)
+        assert data["member_id"] == registered_member["member_id"]
     
-    def test_get_group_members(self):
+    def test_get_group_members(self, client, member_group, registered_member):
         """Test getting all members of a group."""
-        self.test_register_member()
-        
-        response = client.get(f"/api/users/groups/{self.group_id}/members")
+        response = client.get(f"/api/users/groups/{member_group}/members")
         assert response.status_code == 200
         
-        data = response.json()
+        data = _j(response)
         assert data["total_count"] >= 2  # Leader + new member
         assert len(data["members"]) >= 2
+    
+    def test_concurrent_member_registration_same_phone(self, created_group, unique_phone):
+        """Test that only one of several concurrent registrations of a phone wins."""
+        group_id = created_group["group_id"]
+        phone_number = unique_phone()
+        member_data = MemberIn(phone_number=phone_number, full_name="Racer", group_id=group_id)
+        
+        def register(_):
+            try:
+                return user_service.register_member(member_data).member_id
+            except ValueError:
+                return None
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            member_ids = [m for m in executor.map(register, range(32)) if m]
+        
+        assert len(member_ids) == 1
+        assert user_service.get_member_by_phone(phone_number).member_id == member_ids[0]
+        assert user_service.get_group_by_id(group_id).member_count == 2
 
 
 class TestPhoneVerification:
     """Test phone verification functionality."""
     
-    def test_request_otp(self):
-        """Test requesting OTP for phone verification."""
-        otp_request = {
-            "phone_number": "+254700000005",
-            "verification_type": "registration"
-        }
-        
-        response = client.post("/api/users/phone/request-otp", json=otp_request)
-        assert response.status_code == 200
-        
-        data = response.json()
-        assert data["phone_number"] == otp_request["phone_number"]
-        assert data["otp_sent"] == True
+    @pytest.mark.parametrize("steps", [
+        pytest.param([
+            ("request", None, {"otp_sent": True}),
+        ], id="request_ok"),
+        pytest.param([
+            ("request", None, {"otp_sent": True}),
+            ("verify", "000000", {"verified": False}),
+        ], id="verify_invalid"),
+    ])
+    def test_otp_flow(self, client, unique_phone, steps):
+        """Test OTP request and verification scenarios."""
+        phone_number = unique_phone()
+        
+        for action, arg, expected in steps:
+            if action == "request":
+                response = client.post("/api/users/phone/request-otp", json={
+                    "phone_number": phone_number,
+                    "verification_type": "registration"
+                })
+            else:
+                response = client.post("/api/users/phone/verify-otp", json={
+                    "phone_number": phone_number,
+                    "otp_code": arg,
+                    "verification_type": "registration"
+                })
+            assert response.status_code == 200
+            
+            data = _j(response)
+            assert data["phone_number"] == phone_number
+            for field, value in expected.items():
+                assert data[field] == value
     
-    def test_verify_otp_invalid(self):
-        """Test verifying invalid OTP."""
-        # First request OTP
-        otp_request = {
-            "phone_number": "+254700000006",
-            "verification_type": "registration"
-        }
-        client.post("/api/users/phone/request-otp", json=otp_request)
+    def test_otp_rate_limiting(self, client, monkeypatch, unique_phone):
+        """Test OTP rate limiting by inspecting the limiter state after one request."""
+        phone_number = unique_phone()
         
-        # Try to verify with wrong OTP
-        verification_data = {
-            "phone_number": "+254700000006",
-            "otp_code": "000000",
-            "verification_type": "registration"
-        }
+        # Drive the limiter from a virtual clock instead of wall time
+        clock = [datetime.now(timezone.utc)]
+        monkeypatch.setattr(pvs, "_now", lambda: clock[0])
         
-        response = client.post("/api/users/phone/verify-otp", json=verification_data)
+        response = client.post("/api/users/phone/request-otp", json={
+            "phone_number": phone_number,
+            "verification_type": "registration"
+        })
         assert response.status_code == 200
-        
-        data = response.json()
-        assert data["verified"] == False
+        assert _j(response)["otp_sent"] == True
+        
+        # One request recorded in the hourly window, and the cooldown is running
+        assert pvs._OTP_REQUEST_COUNTS[phone_number][1] == 1
+        assert pvs.get_otp_status(phone_number)["can_request_new"] == False
+        retry = asyncio.run(pvs.request_otp(OTPRequestIn(
+            phone_number=phone_number, verification_type="registration"
+        )))
+        assert retry.otp_sent == False
+        
+        # Once the rate-limit window has passed a new OTP may be requested
+        clock[0] += timedelta(minutes=pvs.RATE_LIMIT_MINUTES, seconds=1)
+        assert pvs.get_otp_status(phone_number)["can_request_new"] == True
     
-    def test_otp_rate_limiting(self):
-        """Test OTP rate limiting."""
-        otp_request = {
-            "phone_number": "+254700000007",
+    def test_otp_hourly_limit(self, monkeypatch, unique_phone):
+        """Test that the Nth+1 request in an hour is refused and the next hour starts afresh."""
+        phone_number = unique_phone()
+        request = OTPRequestIn(phone_number=phone_number, verification_type="registration")
+        clock = [datetime(2026, 1, 1, 8, 0, tzinfo=timezone.utc)]
+        monkeypatch.setattr(pvs, "_now", lambda: clock[0])
+        
+        # Space the requests past the per-request cooldown, all inside one hour
+        for _ in range(settings.OTP_RATE_LIMIT_PER_HOUR):
+            assert asyncio.run(pvs.request_otp(request)).otp_sent == True
+            clock[0] += timedelta(minutes=pvs.RATE_LIMIT_MINUTES, seconds=1)
+        
+        refused = asyncio.run(pvs.request_otp(request))
+        assert refused.otp_sent == False
+        assert "Too many OTP requests" in refused.message
+        
+        # The count resets in the next hour window
+        clock[0] = datetime(2026, 1, 1, 9, 0, tzinfo=timezone.utc)
+        assert asyncio.run(pvs.request_otp(request)).otp_sent == True
+        assert pvs._OTP_REQUEST_COUNTS[phone_number][1] == 1
+    
+    def test_cleanup_prunes_past_request_counts(self, monkeypatch, unique_phone):
+        """Test that request counts from earlier hours are dropped by cleanup."""
+        phone_number = unique_phone()
+        clock = [datetime(2026, 1, 1, 8, 30, tzinfo=timezone.utc)]
+        monkeypatch.setattr(pvs, "_now", lambda: clock[0])
+        
+        asyncio.run(pvs.request_otp(OTPRequestIn(phone_number=phone_number, verification_type="registration")))
+        pvs.cleanup_expired_otps()
+        assert phone_number in pvs._OTP_REQUEST_COUNTS
+        
+        clock[0] += timedelta(hours=1)
+        pvs.cleanup_expired_otps()
+        assert phone_number not in pvs._OTP_REQUEST_COUNTS
+    
+    def test_cleanup_expired_otps(self, client, monkeypatch, unique_phone):
+        """Test that expired OTPs are evicted from the store."""
+        phone_number = unique_phone()
+        clock = [datetime.now(timezone.utc)]
+        monkeypatch.setattr(pvs, "_now", lambda: clock[0])
+        
+        client.post("/api/users/phone/request-otp", json={
+            "phone_number": phone_number,
             "verification_type": "registration"
-        }
+        })
+        pvs.cleanup_expired_otps()
+        assert phone_number in pvs._OTP_STORE
         
-        # First request should succeed
-        response1 = client.post("/api/users/phone/request-otp", json=otp_request)
-        assert response1.status_code == 200
-        assert response1.json()["otp_sent"] == True
-        
-        # Second immediate request should be rate limited
-        response2 = client.post("/api/users/phone/request-otp", json=otp_request)
-        assert response2.status_code == 200
-        assert response2.json()["otp_sent"] == False
+        clock[0] += timedelta(minutes=pvs.OTP_EXPIRY_MINUTES, seconds=1)
+        pvs.cleanup_expired_otps()
+        assert phone_number not in pvs._OTP_STORE
 
 
+@pytest.mark.xdist_group("user_mgmt_kyc")
 class TestKYCManagement:
     """Test KYC document submission and verification."""
     
-    def setup_method(self):
-        """Set up test member for KYC tests."""
-        # Create group and member
-        group_data = {
-            "group_name": "KYC Test Group",
-            "location": "Kisumu, Kenya",
-            "leader_phone": "+254700000008",
-            "leader_name": "KYC Leader",
-            "expected_member_count": 5,
-            "treasury_threshold": 2
-        }
-        
-        group_response = client.post("/api/users/groups", json=group_data)
-        self.group_id = group_response.json()["group_id"]
-        
-        member_data = {
-            "phone_number": "+254700000009",
-            "full_name": "KYC Test Member",
-            "group_id": self.group_id,
-            "role": MemberRole.MEMBER
-        }
-        
-        member_response = client.post("/api/users/members", json=member_data)
-        self.member_id = member_response.json()["member_id"]
-    
-    def test_submit_kyc_document(self):
+    def test_submit_kyc_document(self, kyc_member, kyc_document):
         """Test submitting KYC document."""
-        document_data = {
-            "member_id": self.member_id,
-            "document_type": KYCDocumentType.NATIONAL_ID,
-            "document_number": "12345678",
-            "issuing_authority": "Government of Kenya"
-        }
+        _, member_id = kyc_member
         
-        response = client.post("/api/users/kyc/documents", json=document_data)
+        assert kyc_document["member_id"] == member_id
+        assert kyc_document["document_type"] == _NATIONAL_ID
+        assert kyc_document["document_number"] == "12345678"
+    
+    def test_submit_kyc_document_pin_failure(self, client, monkeypatch, kyc_member):
+        """Test that a failing IPFS pin in the background task does not fail the submission."""
+        _, member_id = kyc_member
+        pinned = []
+        
+        def failing_pin(cid):
+            pinned.append(cid)
+            raise RuntimeError("IPFS node unreachable")
+        
+        monkeypatch.setattr(kyc_service, "pin_cid", failing_pin)
+        
+        response = client.post("/api/users/kyc/documents", json={
+            "member_id": member_id,
+            "document_type": _NATIONAL_ID,
+            "document_number": "55555555",
+            "document_image_cid": "bafyfailingpin"
+        })
         assert response.status_code == 201
-        
-        data = response.json()
-        assert data["member_id"] == self.member_id
-        assert data["document_type"] == KYCDocumentType.NATIONAL_ID
-        assert data["document_number"] == document_data["document_number"]
+        assert _j(response)["document_image_cid"] == "bafyfailingpin"
+        assert pinned == ["bafyfailingpin"]
     
-    def test_get_member_documents(self):
+    def test_get_member_documents(self, client, kyc_member, kyc_document):
         """Test getting member's KYC documents."""
-        self.test_submit_kyc_document()
+        _, member_id = kyc_member
         
-        response = client.get(f"/api/users/kyc/members/{self.member_id}/documents")
+        response = client.get(f"/api/users/kyc/members/{member_id}/documents")
         assert response.status_code == 200
         
-        documents = response.json()
+        documents = _j(response)
         assert isinstance(documents, list)
         assert len(documents) >= 1
     
-    def test_kyc_review(self):
+    def test_kyc_review(self, client, kyc_member, kyc_document):
         """Test KYC review process."""
-        self.test_submit_kyc_document()
+        _, member_id = kyc_member
         
         review_data = {
-            "member_id": self.member_id,
-            "status": KYCStatus.VERIFIED,
+            "member_id": member_id,
+            "status": _VERIFIED,
             "reviewer_notes": "Documents verified successfully"
         }
         
         response = client.post("/api/users/kyc/review", json=review_data)
         assert response.status_code == 200
         
-        data = response.json()
-        assert data["member_id"] == self.member_id
-        assert data["new_status"] == KYCStatus.VERIFIED
+        data = _j(response)
+        assert data["member_id"] == member_id
+        assert data["new_status"] == _VERIFIED
 
 
+    def test_verify_document_refreshes_cached_model(self, registered_member):
+        """Test that listing documents after verify_document shows the new status."""
+        member_id = registered_member["member_id"]
+        document = kyc_service.submit_kyc_document(KYCDocumentIn(
+            member_id=member_id, document_type=KYCDocumentType.NATIONAL_ID, document_number="24682468"
+        ))
+        assert kyc_service.get_member_documents(member_id) == [document]
+        
+        verified = kyc_service.verify_document(document.document_id, VerificationStatus.VERIFIED)
+        assert verified.verification_status == VerificationStatus.VERIFIED
+        assert verified.verified_at is not None
+        assert kyc_service.get_member_documents(member_id) == [verified]
+        assert kyc_service.verify_document("missing-document", VerificationStatus.VERIFIED) is None
+    
+    def test_kyc_indexes_match_recount(self, member_group, registered_member, unique_phone):
+        """Test that the pending queue and status counters always agree with a full recount."""
+        def assert_consistent():
+            counts, pending, total = _recount_kyc()
+            stats = kyc_service.get_kyc_statistics()
+            assert stats["total_members"] == total
+            assert stats["verified_count"] == counts[KYCStatus.VERIFIED]
+            assert stats["pending_count"] == counts[KYCStatus.PENDING]
+            assert stats["rejected_count"] == counts[KYCStatus.REJECTED]
+            assert [review["member"].member_id for review in kyc_service.get_pending_kyc_reviews()] == pending
+        
+        member_id = registered_member["member_id"]
+        other_id = user_service.register_member(MemberIn(
+            phone_number=unique_phone(), full_name="Second Member", group_id=member_group
+        )).member_id
+        
+        # Submit
+        for document_member in (member_id, other_id):
+            kyc_service.submit_kyc_document(KYCDocumentIn(
+                member_id=document_member, document_type=KYCDocumentType.NATIONAL_ID, document_number="87654321"
+            ))
+        assert_consistent()
+        
+        # Review, then re-review back into the queue
+        for kyc_status in (KYCStatus.REJECTED, KYCStatus.PENDING, KYCStatus.REJECTED):
+            kyc_service.review_kyc_documents(KYCReviewIn(member_id=member_id, status=kyc_status))
+            assert_consistent()
+        
+        # A further document does not count the member twice
+        kyc_service.submit_kyc_document(KYCDocumentIn(
+            member_id=member_id, document_type=KYCDocumentType.PASSPORT, document_number="A1234567"
+        ))
+        assert_consistent()
+        
+        # Auto-verify through a community attestation once the phone is verified
+        user_service.update_member_verification_status(other_id, phone_verified=True)
+        kyc_service.submit_kyc_document(KYCDocumentIn(
+            member_id=other_id, document_type=KYCDocumentType.COMMUNITY_ATTESTATION, document_number="ATT-001"
+        ))
+        assert kyc_service.auto_verify_basic_kyc(other_id) == True
+        assert_consistent()
+        
+        # Reviewing a member without documents leaves the indexes alone
+        leader_id = user_service.get_group_by_id(member_group).leader_id
+        kyc_service.review_kyc_documents(KYCReviewIn(member_id=leader_id, status=KYCStatus.VERIFIED))
+        assert_consistent()
+
+
+class TestPagination:
+    """Test offset/limit pagination on list endpoints."""
+    
+    def test_paginated_documents(self, client, registered_member):
+        """Test that offset and limit slice the list and the defaults return everything."""
+        member_id = registered_member["member_id"]
+        document_ids = [
+            kyc_service.submit_kyc_document(KYCDocumentIn(
+                member_id=member_id, document_type=KYCDocumentType.NATIONAL_ID, document_number=f"1000000{i}"
+            )).document_id
+            for i in range(3)
+        ]
+        url = f"/api/users/kyc/members/{member_id}/documents"
+        
+        response = client.get(url)
+        assert response.status_code == 200
+        assert [document["document_id"] for document in _j(response)] == document_ids
+        
+        response = client.get(url, params={"offset": 1, "limit": 1})
+        assert response.status_code == 200
+        assert [document["document_id"] for document in _j(response)] == document_ids[1:2]
+        
+        response = client.get(url, params={"offset": 2, "limit": 5})
+        assert [document["document_id"] for document in _j(response)] == document_ids[2:]
+    
+    def test_pagination_defaults(self):
+        """Test the default page."""
+        params = PaginationParams()
+        assert (params.offset, params.limit) == (0, 50)
+    
+    @pytest.mark.parametrize("query", [
+        {"limit": 0},
+        {"limit": -1},
+        {"limit": 1001},
+        {"offset": -1},
+    ])
+    def test_pagination_rejects_out_of_range(self, client, query):
+        """Test that negative offsets and out-of-range limits are rejected."""
+        response = client.get("/api/users/proposals", params=query)
+        assert response.status_code == 422
+
+
+class TestProposalListings:
+    """Test the cached proposal listings."""
+    
+    def test_listings_follow_status_changes(self, client, registered_member):
+        """Test that cached listings are dropped when a proposal is created or changes status."""
+        assert client.get("/api/users/proposals").status_code == 200
+        
+        proposal_id = proposal_service.create_proposal(ProposalIn(
+            group_id=registered_member["group_id"],
+            title="Repair the borehole",
+            description="Replace the borehole pump and pipes",
+            amount_requested=5000,
+            milestone_description="Borehole running again",
+            deadline=datetime.now(timezone.utc) + timedelta(days=7),
+            created_by=registered_member["member_id"]
+        )).proposal_id
+        active_ids = [proposal["proposal_id"] for proposal in _j(client.get("/api/users/proposals"))]
+        assert proposal_id in active_ids
+        assert _j(client.get("/api/users/proposals/status/PASSED")) == []
+        
+        proposal_service.update_proposal_status(proposal_id, "PASSED")
+        active_ids = [proposal["proposal_id"] for proposal in _j(client.get("/api/users/proposals"))]
+        assert proposal_id not in active_ids
+        passed_ids = [proposal["proposal_id"] for proposal in _j(client.get("/api/users/proposals/status/PASSED"))]
+        assert passed_ids == [proposal_id]
+
+
+@pytest.mark.xdist_group("user_mgmt_sms_webhook")
 class TestSMSWebhook:
     """Test SMS webhook functionality."""
     
-    def test_sms_webhook_unregistered_phone(self):
+    def test_sms_webhook_unregistered_phone(self, client, unique_phone):
         """Test SMS webhook with unregistered phone number."""
         webhook_data = {
-            "From": "+254700000999",
+            "From": unique_phone(),
             "To": "+254700000000",
             "Body": "YES001",
             "MessageSid": "SM123456789"
@@ -280,37 +502,20 @@ class TestSMSWebhook:
         response = client.post("/api/users/webhooks/sms", json=webhook_data)
         assert response.status_code == 200
         
-        data = response.json()
+        data = _j(response)
         assert data["processed"] == False
         assert "not registered" in data["error_message"]
     
-    def test_sms_webhook_invalid_format(self):
+    def test_sms_webhook_invalid_format(self, client, registered_member):
         """Test SMS webhook with invalid vote format."""
-        # First create a member
-        group_data = {
-            "group_name": "SMS Test Group",
-            "location": "Eldoret, Kenya",
-            "leader_phone": "+254700000010",
-            "leader_name": "SMS Leader",
-            "expected_member_count": 5,
-            "treasury_threshold": 2
-        }
-        
-        group_response = client.post("/api/users/groups", json=group_data)
-        group_id = group_response.json()["group_id"]
-        
-        member_data = {
-            "phone_number": "+254700000011",
-            "full_name": "SMS Test Member",
-            "group_id": group_id,
-            "role": MemberRole.MEMBER
-        }
+        from app.services.user_service import update_member_verification_status
         
-        client.post("/api/users/members", json=member_data)
+        # Votes are only parsed for verified phones
+        update_member_verification_status(registered_member["member_id"], phone_verified=True)
         
         # Test invalid SMS format
         webhook_data = {
-            "From": "+254700000011",
+            "From": registered_member["phone_number"],
             "To": "+254700000000",
             "Body": "INVALID MESSAGE",
             "MessageSid": "SM123456790"
@@ -319,40 +524,224 @@ class TestSMSWebhook:
         response = client.post("/api/users/webhooks/sms", json=webhook_data)
         assert response.status_code == 200
         
-        data = response.json()
+        data = _j(response)
         assert data["processed"] == False
         assert "Invalid vote format" in data["error_message"]
+    
+    def test_sms_webhook_vote_recorded(self, client, monkeypatch, registered_member):
+        """Test that a YES<code> reply records the vote and queues a confirmation SMS."""
+        user_service.update_member_verification_status(registered_member["member_id"], phone_verified=True)
+        short_code = sms_service.register_proposal_for_sms_voting(
+            proposal_id="webhook-proposal",
+            proposal_title="Buy a water pump",
+            group_id=registered_member["group_id"],
+            voting_deadline=datetime.now(timezone.utc) + timedelta(days=7)
+        )
+        submitted, sent = [], []
+        
+        class InlineExecutor:
+            def submit(self, fn, *args):
+                submitted.append(args)
+                fn(*args)
+        
+        monkeypatch.setattr(sms_service, "_SMS_EXECUTOR", InlineExecutor())
+        monkeypatch.setattr(sms_service, "send_sms", lambda phone, message: sent.append(phone) or True)
+        webhook_data = {
+            "From": registered_member["phone_number"],
+            "To": "+254700000000",
+            "Body": f"yes{short_code}",
+            "MessageSid": "SM123456791"
+        }
+        
+        response = client.post("/api/users/webhooks/sms", json=webhook_data)
+        assert response.status_code == 200
+        data = _j(response)
+        assert data["processed"] == True
+        assert data["vote"] == True
+        assert vote_service.get_vote_tally("webhook-proposal") == {"yes": 1, "no": 0, "total": 1}
+        assert submitted == [(registered_member["phone_number"], data["response_message"])]
+        assert sent == [registered_member["phone_number"]]
+        
+        # A second reply from the same member is refused without another confirmation
+        data = _j(client.post("/api/users/webhooks/sms", json=webhook_data))
+        assert data["processed"] == False
+        assert "already voted" in data["response_message"]
+        assert len(submitted) == 1
+    
+    @pytest.mark.parametrize("body, deadline, verified, error", [
+        pytest.param("YES{code}", timedelta(days=7), False, "Phone number not verified", id="unverified"),
+        pytest.param("NO9999X", timedelta(days=7), True, "Invalid vote format", id="bad_format"),
+        pytest.param("NO{other}", timedelta(days=7), True, "Invalid proposal code", id="unknown_code"),
+        pytest.param("NO{code}", timedelta(days=-1), True, "Voting deadline passed", id="deadline_passed"),
+    ])
+    def test_sms_webhook_vote_refused(self, client, registered_member, body, deadline, verified, error):
+        """Test the reasons an SMS vote is refused without recording anything."""
+        if verified:
+            user_service.update_member_verification_status(registered_member["member_id"], phone_verified=True)
+        short_code = sms_service.register_proposal_for_sms_voting(
+            proposal_id="webhook-proposal",
+            proposal_title="Buy a water pump",
+            group_id=registered_member["group_id"],
+            voting_deadline=datetime.now(timezone.utc) + deadline
+        )
+        other_code = f"{(int(short_code) + 1) % 10000:04d}"
+        
+        response = client.post("/api/users/webhooks/sms", json={
+            "From": registered_member["phone_number"],
+            "To": "+254700000000",
+            "Body": body.format(code=short_code, other=other_code),
+            "MessageSid": "SM123456792"
+        })
+        data = _j(response)
+        assert data["processed"] == False
+        assert data["error_message"] == error
+        assert vote_service.get_vote_tally("webhook-proposal")["total"] == 0
+
+
+@pytest.mark.xdist_group("user_mgmt_sms_voting")
+class TestSMSVoting:
+    """Test SMS voting short codes and proposal broadcasts."""
+    
+    def _register(self, proposal_id="proposal-1", title="Buy a water pump"):
+        return sms_service.register_proposal_for_sms_voting(
+            proposal_id=proposal_id,
+            proposal_title=title,
+            group_id="group-1",
+            voting_deadline=datetime.now(timezone.utc) + timedelta(days=7)
+        )
+    
+    def test_short_code_format(self):
+        """Test that short codes are four digits and parse back as YES####/NO#### votes."""
+        short_code = self._register()
+        
+        assert len(short_code) == 4 and short_code.isdigit()
+        assert f"YES{short_code}" in sms_service._ACTIVE_PROPOSALS["proposal-1"]["broadcast_message"]
+        assert sms_service._parse_vote_message(f"NO{short_code}") == (False, short_code)
+        assert sms_service._find_proposal_by_short_code(short_code) == "proposal-1"
+    
+    def test_short_code_collision_retry(self, monkeypatch):
+        """Test that a code already in use is redrawn."""
+        sms_service._SHORT_CODE_TO_PROPOSAL["0042"] = "other-proposal"
+        draws = iter([42, 42, 7])
+        monkeypatch.setattr(sms_service.secrets, "randbelow", lambda _: next(draws))
+        
+        assert self._register() == "0007"
+        assert sms_service._SHORT_CODE_TO_PROPOSAL["0042"] == "other-proposal"
+    
+    def test_short_code_space_exhausted(self, monkeypatch):
+        """Test that registration fails instead of spinning once every code is taken."""
+        monkeypatch.setattr(sms_service, "_SHORT_CODE_SPACE", 2)
+        self._register("proposal-1")
+        self._register("proposal-2")
+        
+        with pytest.raises(ValueError):
+            self._register("proposal-3")
+    
+    def test_reregistration_frees_previous_code(self, monkeypatch):
+        """Test that re-registering a proposal releases its old code."""
+        draws = iter([1, 2])
+        monkeypatch.setattr(sms_service.secrets, "randbelow", lambda _: next(draws))
+        
+        assert self._register() == "0001"
+        assert self._register(title="Buy two water pumps") == "0002"
+        assert "0001" not in sms_service._SHORT_CODE_TO_PROPOSAL
+        assert sms_service._SHORT_CODE_TO_PROPOSAL["0002"] == "proposal-1"
+    
+    def test_close_voting_frees_code(self):
+        """Test that closing a vote releases its short code."""
+        short_code = self._register()
+        
+        assert sms_service.close_proposal_voting("proposal-1") == True
+        assert short_code not in sms_service._SHORT_CODE_TO_PROPOSAL
+        assert sms_service.close_proposal_voting("proposal-1") == False
+    
+    def test_check_voting_deadlines(self, monkeypatch, registered_member):
+        """Test that only expired proposals still in VOTING are closed, freeing their short codes."""
+        clock = [datetime(2026, 1, 1, 8, 0, tzinfo=timezone.utc)]
+        monkeypatch.setattr(proposal_service, "_now", lambda: clock[0])
+        
+        def create(title, deadline):
+            return proposal_service.create_proposal(ProposalIn(
+                group_id=registered_member["group_id"],
+                title=title,
+                description="Shared equipment for the group",
+                amount_requested=1000,
+                milestone_description="Equipment delivered",
+                deadline=clock[0] + deadline,
+                created_by=registered_member["member_id"]
+            )).proposal_id
+        
+        expired = create("Expiring proposal", timedelta(hours=1))
+        future = create("Future proposal", timedelta(days=10))
+        deleted = create("Deleted proposal", timedelta(hours=2))
+        passed = create("Passed proposal", timedelta(hours=3))
+        short_code = self._register(expired)
+        proposal_service.delete_proposal(deleted)
+        proposal_service.update_proposal_status(passed, "PASSED")
+        
+        assert proposal_service.check_voting_deadlines() == 0
+        
+        clock[0] += timedelta(days=1)
+        assert proposal_service.check_voting_deadlines() == 1
+        assert proposal_service.get_proposal_by_id(expired).status == "FAILED"
+        assert proposal_service.get_proposal_by_id(future).status == "VOTING"
+        assert proposal_service.get_proposal_by_id(passed).status == "PASSED"
+        assert short_code not in sms_service._SHORT_CODE_TO_PROPOSAL
+        assert [proposal_id for _, proposal_id in proposal_service._VOTING_DEADLINE_HEAP] == [future]
+    
+    def test_start_sms_voting_rerun_sends_nothing_new(self, monkeypatch, registered_member):
+        """Test that rerunning start_sms_voting keeps the short code and skips members already messaged."""
+        user_service.update_member_verification_status(registered_member["member_id"], phone_verified=True)
+        proposal = proposal_service.create_proposal(ProposalIn(
+            group_id=registered_member["group_id"],
+            title="Buy a water pump",
+            description="Shared irrigation pump for the group",
+            amount_requested=25000,
+            milestone_description="Pump installed and running",
+            deadline=datetime.now(timezone.utc) + timedelta(days=7),
+            created_by=registered_member["member_id"]
+        ))
+        sent = []
+        monkeypatch.setattr(sms_service, "send_sms", lambda phone, message: sent.append(phone) or True)
+        
+        first = proposal_service.start_sms_voting(proposal.proposal_id)
+        assert sent == [registered_member["phone_number"]]
+        assert first["broadcast_result"]["sent_count"] == 1
+        
+        second = proposal_service.start_sms_voting(proposal.proposal_id)
+        assert second["short_code"] == first["short_code"]
+        assert second["broadcast_result"]["sent_count"] == 0
+        assert second["broadcast_result"]["already_sent_count"] == 1
+        assert len(sent) == 1
 
 
 class TestStatistics:
     """Test statistics endpoints."""
     
-    def test_phone_verification_stats(self):
-        """Test phone verification statistics."""
+    def test_phone_verification_stats(self, client):
+        """Test phone verification statistics over HTTP (covers the stats routing)."""
         response = client.get("/api/users/stats/phone-verification")
         assert response.status_code == 200
         
-        data = response.json()
+        data = _j(response)
         assert "total_members" in data
         assert "verified_phones" in data
         assert "verification_rate" in data
     
     def test_kyc_stats(self):
         """Test KYC statistics."""
-        response = client.get("/api/users/stats/kyc")
-        assert response.status_code == 200
+        from app.services.kyc_service import get_kyc_statistics
         
-        data = response.json()
+        data = get_kyc_statistics()
         assert "total_members" in data
         assert "verified_count" in data
         assert "pending_count" in data
     
     def test_sms_stats(self):
         """Test SMS statistics."""
-        response = client.get("/api/users/stats/sms")
-        assert response.status_code == 200
+        from app.services.sms_service import get_sms_statistics
         
-        data = response.json()
+        data = get_sms_statistics()
         assert "total_interactions" in data
         assert "successful_votes" in data
         assert "success_rate" in data
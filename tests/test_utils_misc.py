@@ -17,3 +17,72 @@ def test_oracle_verify_attestation_false():
 
 def test_celestia_anchor_hash():
     assert anchor_hash("0xdeadbeef") is True
+
+
+def test_ttl_cached_and_invalidate():
+    from app.utils.cache import invalidate, ttl_cached
+
+    calls = []
+
+    @ttl_cached("test:counter", ttl=60)
+    def counter():
+        calls.append(1)
+        return len(calls)
+
+    assert counter() == 1
+    assert counter() == 1
+    invalidate("test:counter")
+    assert counter() == 2
+
+
+def test_validate_phone_numbers_bulk_matches_single():
+    from app.utils.sms import validate_phone_number, validate_phone_numbers_bulk
+
+    numbers = ["+254700000001", "0700000001", "+0123", "+254700\n+254701", "", "+12"]
+    assert validate_phone_numbers_bulk(numbers) == [validate_phone_number(n) for n in numbers]
+
+
+def test_cache_clear():
+    from app.utils.cache import clear, ttl_cached
+
+    calls = []
+
+    @ttl_cached("test:clear", ttl=60)
+    def counter():
+        calls.append(1)
+        return len(calls)
+
+    assert counter() == 1
+    clear()
+    assert counter() == 2
+
+
+def test_ttl_cached_per_arguments():
+    from app.utils import cache
+
+    calls = []
+
+    @cache.ttl_cached("test:args", ttl=60)
+    def page(offset=0, limit=None):
+        calls.append((offset, limit))
+        return len(calls)
+
+    assert page(offset=0, limit=10) == 1
+    assert page(offset=0, limit=10) == 1
+    assert page(offset=10, limit=10) == 2
+    cache.invalidate("test:args")
+    assert page(offset=0, limit=10) == 3
+
+
+def test_ttl_cached_bounds_argument_entries(monkeypatch):
+    from app.utils import cache
+
+    monkeypatch.setattr(cache, "_MAX_ENTRIES_PER_KEY", 2)
+
+    @cache.ttl_cached("test:bounded", ttl=60)
+    def echo(value):
+        return value
+
+    for value in range(5):
+        assert echo(value) == value
+        assert len(cache._CACHE["test:bounded"]) <= 2
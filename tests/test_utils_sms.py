@@ -0,0 +1,258 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+import requests
+import urllib3
+
+import app.utils.sms as sms
+
+
+@pytest.fixture
+def twilio(monkeypatch):
+    """Configure fake Twilio credentials, including a Notify service."""
+    monkeypatch.setattr(sms.settings, "TWILIO_ACCOUNT_SID", "AC123", raising=False)
+    monkeypatch.setattr(sms.settings, "TWILIO_AUTH_TOKEN", "secret", raising=False)
+    monkeypatch.setattr(sms.settings, "TWILIO_NOTIFY_SERVICE_SID", "IS123", raising=False)
+    # URLs and the auth header are bound at import, so rebuild them for these credentials
+    auth_headers = sms._basic_auth_headers("AC123", "secret")
+    monkeypatch.setattr(sms, "_TWILIO_MESSAGES_URL", "https://api.twilio.com/2010-04-01/Accounts/AC123/Messages.json")
+    monkeypatch.setattr(sms, "_TWILIO_AUTH_HEADERS", auth_headers)
+    monkeypatch.setattr(sms, "_POOL_HEADERS", {**sms._POOL_HEADERS, **auth_headers})
+    monkeypatch.setitem(sms._SESSION.headers, "Authorization", auth_headers["Authorization"])
+
+
+@pytest.fixture
+def twilio_messages(twilio, monkeypatch):
+    """Fake Twilio credentials with Notify off, so bulk sends go per number."""
+    monkeypatch.setattr(sms.settings, "TWILIO_NOTIFY_SERVICE_SID", None, raising=False)
+
+
+def _numbers(count):
+    return [f"+254{i:09d}" for i in range(1, count + 1)]
+
+
+def _record_session_posts(monkeypatch, status_codes):
+    """Patch the shared session's post; each call answers with the next status code."""
+    calls = []
+    statuses = iter(status_codes)
+
+    def fake_post(url, data=None, timeout=None):
+        calls.append((url, data))
+        return SimpleNamespace(status_code=next(statuses), text="", content=b'{"sid": "SM1"}')
+
+    monkeypatch.setattr(sms._SESSION, "post", fake_post)
+    return calls
+
+
+def _record_async_sends(monkeypatch):
+    """Patch the per-number async send used by the bulk fallback."""
+    sent = []
+
+    async def fake_send(to_phone, message, client=None):
+        sent.append(to_phone)
+        return True
+
+    monkeypatch.setattr(sms, "send_sms_async", fake_send)
+    return sent
+
+
+def test_bulk_sms_notify_single_batch(twilio, monkeypatch):
+    calls = _record_session_posts(monkeypatch, [201])
+    sent = _record_async_sends(monkeypatch)
+    numbers = _numbers(3)
+
+    res = sms.send_bulk_sms(numbers, "hello")
+    assert res == {"total": 3, "sent": 3, "failed": 0, "failed_numbers": []}
+    assert len(calls) == 1
+    url, data = calls[0]
+    assert url.endswith("/Services/IS123/Notifications")
+    assert data[0] == ("Body", "hello")
+    assert [name for name, _ in data[1:]] == ["ToBinding"] * 3
+    assert sent == []
+
+
+def test_bulk_sms_notify_non_201_falls_back(twilio, monkeypatch):
+    calls = _record_session_posts(monkeypatch, [500])
+    sent = _record_async_sends(monkeypatch)
+    numbers = _numbers(3)
+
+    res = sms.send_bulk_sms(numbers, "hello")
+    assert res["sent"] == 3
+    assert res["failed"] == 0
+    assert len(calls) == 1
+    assert sent == numbers
+
+
+def test_bulk_sms_notify_network_error_falls_back(twilio, monkeypatch):
+    def fake_post(url, data=None, timeout=None):
+        raise requests.exceptions.ConnectionError("down")
+
+    monkeypatch.setattr(sms._SESSION, "post", fake_post)
+    sent = _record_async_sends(monkeypatch)
+    numbers = _numbers(2)
+
+    assert sms.send_bulk_sms(numbers, "hello")["sent"] == 2
+    assert sent == numbers
+
+
+def test_bulk_sms_notify_chunks_above_binding_limit(twilio, monkeypatch):
+    calls = _record_session_posts(monkeypatch, [201, 500])
+    sent = _record_async_sends(monkeypatch)
+    numbers = _numbers(sms._NOTIFY_MAX_BINDINGS + 1)
+
+    res = sms.send_bulk_sms(numbers, "hello")
+    assert [len(data) - 1 for _, data in calls] == [sms._NOTIFY_MAX_BINDINGS, 1]
+    # The first batch was accepted; only the rejected tail is resent per number
+    assert res["sent"] == len(numbers)
+    assert sent == numbers[sms._NOTIFY_MAX_BINDINGS:]
+
+
+def _mock_async_client(monkeypatch, status_code=201):
+    """Route async sends through an httpx.MockTransport; returns the recipients it saw."""
+    seen = []
+
+    def handler(request):
+        assert str(request.url) == "https://api.twilio.com/2010-04-01/Accounts/AC123/Messages.json"
+        assert request.headers["Authorization"] == "Basic QUMxMjM6c2VjcmV0"
+        seen.append(dict(httpx.QueryParams(request.content.decode()))["To"])
+        return httpx.Response(status_code, json={"sid": "SM1"})
+
+    def new_client():
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler), headers=sms._TWILIO_AUTH_HEADERS)
+
+    monkeypatch.setattr(sms, "_new_async_client", new_client)
+    return seen
+
+
+def test_bulk_sms_without_running_loop_uses_async_client(twilio_messages, monkeypatch):
+    seen = _mock_async_client(monkeypatch)
+    monkeypatch.setattr(sms, "send_sms", lambda *a: pytest.fail("thread fallback used"))
+    numbers = _numbers(5)
+
+    res = sms.send_bulk_sms(numbers + ["not-a-number"], "hello")
+    assert res == {"total": 6, "sent": 5, "failed": 1, "failed_numbers": ["not-a-number"]}
+    assert sorted(seen) == numbers
+
+
+def test_bulk_sms_inside_running_loop_uses_threads(twilio_messages, monkeypatch):
+    seen = _mock_async_client(monkeypatch)
+    sent = []
+    monkeypatch.setattr(sms, "send_sms", lambda phone, message: sent.append(phone) or phone != "+254000000002")
+    numbers = _numbers(3)
+
+    async def call_from_loop():
+        return sms.send_bulk_sms(numbers, "hello")
+
+    res = asyncio.run(call_from_loop())
+    assert res["sent"] == 2
+    assert res["failed_numbers"] == ["+254000000002"]
+    assert sorted(sent) == numbers
+    assert seen == []
+
+
+def test_bulk_sms_async_failed_status(twilio_messages, monkeypatch):
+    seen = _mock_async_client(monkeypatch, status_code=400)
+    monkeypatch.setattr(sms, "_ASYNC_CLIENT", None)
+    numbers = _numbers(2)
+
+    async def send():
+        try:
+            return await sms.send_bulk_sms_async(numbers, "hello")
+        finally:
+            await sms.close_async_client()
+
+    res = asyncio.run(send())
+    assert res["failed"] == 2
+    assert sorted(seen) == numbers
+    assert sms._ASYNC_CLIENT is None
+
+
+def test_send_sms_async_network_error(twilio_messages):
+    def handler(request):
+        raise httpx.ConnectError("down", request=request)
+
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await sms.send_sms_async("+254700000001", "hello", client)
+
+    assert asyncio.run(send()) is False
+
+
+def _patch_pool(monkeypatch, response=None, error=None):
+    """Patch the urllib3 fast path; returns the (method, url, body, headers) of each request."""
+    calls = []
+
+    def fake_request(method, url, body=None, headers=None, timeout=None):
+        calls.append((method, url, body, headers))
+        if error is not None:
+            raise error
+        return response
+
+    monkeypatch.setattr(sms, "_SMS_FAST_PATH", True)
+    monkeypatch.setattr(sms._POOL, "request", fake_request)
+    return calls
+
+
+def test_send_sms_fast_path_ok(twilio_messages, monkeypatch):
+    calls = _patch_pool(monkeypatch, SimpleNamespace(status=201, data=b'{"sid": "SM1"}'))
+
+    assert sms.send_sms("+254700000001", "hello") is True
+    method, url, body, headers = calls[0]
+    assert (method, url) == ("POST", "https://api.twilio.com/2010-04-01/Accounts/AC123/Messages.json")
+    assert headers["Authorization"] == "Basic QUMxMjM6c2VjcmV0"  # base64("AC123:secret")
+    assert b"To=%2B254700000001" in body and b"Body=hello" in body
+
+
+def test_send_sms_fast_path_error_status(twilio_messages, monkeypatch):
+    _patch_pool(monkeypatch, SimpleNamespace(status=400, data=b'{"message": "bad number"}'))
+
+    assert sms.send_sms("+254700000001", "hello") is False
+
+
+def test_send_sms_fast_path_http_error(twilio_messages, monkeypatch):
+    _patch_pool(monkeypatch, error=urllib3.exceptions.MaxRetryError(None, sms._TWILIO_MESSAGES_URL))
+
+    assert sms.send_sms("+254700000001", "hello") is False
+
+
+def test_send_sms_reuses_shared_session(twilio_messages, monkeypatch):
+    sessions = []
+
+    def fake_post(url, data=None, timeout=None):
+        assert url == "https://api.twilio.com/2010-04-01/Accounts/AC123/Messages.json"
+        assert sms._SESSION.headers["Authorization"] == "Basic QUMxMjM6c2VjcmV0"
+        sessions.append(sms._SESSION)
+        return SimpleNamespace(status_code=201, content=b'{"sid": "SM1"}')
+
+    monkeypatch.setattr(sms, "_SMS_FAST_PATH", False)
+    monkeypatch.setattr(sms._SESSION, "post", fake_post)
+    monkeypatch.setattr(sms.requests, "Session", lambda: pytest.fail("new session created"))
+    monkeypatch.setattr(sms.requests, "post", lambda *a, **k: pytest.fail("module-level post used"))
+
+    assert sms.send_sms("+254700000001", "hello") is True
+    assert sms.send_sms("+254700000002", "hello") is True
+    assert len(sessions) == 2 and sessions[0] is sessions[1] is sms._SESSION
+
+
+def test_send_sms_session_error_status(twilio_messages, monkeypatch):
+    monkeypatch.setattr(sms, "_SMS_FAST_PATH", False)
+    monkeypatch.setattr(sms._SESSION, "post", lambda *a, **k: SimpleNamespace(status_code=401, content=b"denied"))
+
+    assert sms.send_sms("+254700000001", "hello") is False
+
+
+def test_basic_auth_header_matches_requests():
+    prepared = requests.Request("POST", sms._TWILIO_MESSAGES_URL, auth=("AC123", "secret")).prepare()
+
+    assert sms._basic_auth_headers("AC123", "secret") == {"Authorization": prepared.headers["Authorization"]}
+    assert sms._basic_auth_headers("AC123", None) == {}
+
+
+def test_precomputed_auth_headers_are_shared():
+    expected = sms._basic_auth_headers(sms.settings.TWILIO_ACCOUNT_SID, sms.settings.TWILIO_AUTH_TOKEN)
+
+    assert sms._TWILIO_AUTH_HEADERS == expected
+    assert sms._POOL_HEADERS.items() >= expected.items()
+    assert sms._SESSION.headers.get("Authorization") == expected.get("Authorization")